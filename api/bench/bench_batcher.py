@@ -0,0 +1,100 @@
+"""
+Query-embedding throughput and latency: the EmbeddingBatcher against the
+old path of one encode([text]) per question behind a Semaphore(5).
+
+Run from api/:  python -m bench.bench_batcher [--concurrency 1 10 100]
+
+By default encode is a stand-in that costs a fixed per-call overhead plus
+a per-text cost, which is the shape of an ONNX MiniLM call. --model loads
+the real embedding model instead.
+"""
+
+from config import EMB_MODEL
+from services.batcher import EmbeddingBatcher
+
+import argparse
+import asyncio
+import statistics
+import time
+import numpy as np
+
+
+def stand_in_encode(call_ms: float, text_ms: float):
+    def encode(texts):
+        # Busy-wait holds the GIL, so concurrent per-call encodes serialize;
+        # ONNX releases it and spreads a call over cores, so check with --model
+        end = time.perf_counter() + (call_ms + text_ms * len(texts)) / 1000
+        while time.perf_counter() < end:
+            pass
+        return np.zeros((len(texts), 384), dtype=np.float32)
+
+    return encode
+
+
+async def run_clients(embed, concurrency: int, requests: int) -> dict:
+    latencies = []
+    counter = iter(range(requests))
+
+    async def client():
+        for i in counter:
+            start = time.perf_counter()
+            await embed(f"What does section {i} of the paper propose?")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "qps": requests / elapsed,
+        "p50_ms": 1000 * statistics.median(latencies),
+        "p99_ms": 1000 * latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))],
+    }
+
+
+async def bench(encode, concurrency: int, requests: int) -> tuple[dict, dict]:
+    semaphore = asyncio.Semaphore(5)
+
+    async def unbatched(text: str):
+        async with semaphore:
+            loop = asyncio.get_running_loop()
+            return (await loop.run_in_executor(None, encode, [text]))[0]
+
+    batcher = EmbeddingBatcher(encode)
+    before = await run_clients(unbatched, concurrency, requests)
+    after = await run_clients(batcher.embed, concurrency, requests)
+    after["avg_batch"] = batcher.stats()["avg_batch_size"]
+    return before, after
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--call-ms", type=float, default=4.0)
+    parser.add_argument("--text-ms", type=float, default=0.5)
+    parser.add_argument("--model", action="store_true", help=f"Use {EMB_MODEL}")
+    args = parser.parse_args()
+
+    if args.model:
+        from light_embed import TextEmbedding
+
+        encode = TextEmbedding(EMB_MODEL).encode
+    else:
+        encode = stand_in_encode(args.call_ms, args.text_ms)
+
+    print(
+        f"{'clients':>8} {'path':>10} {'qps':>8} {'p50 ms':>8} {'p99 ms':>8} {'batch':>6}"
+    )
+    for concurrency in args.concurrency:
+        before, after = asyncio.run(bench(encode, concurrency, args.requests))
+        for name, row in (("per-call", before), ("batcher", after)):
+            print(
+                f"{concurrency:>8} {name:>10} {row['qps']:>8.1f} {row['p50_ms']:>8.1f} "
+                f"{row['p99_ms']:>8.1f} {row.get('avg_batch', 1):>6}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Event-loop lag while a large upsert runs, as seen by any other request on
+the same worker (/health is a plain async handler, so its latency is the
+loop lag plus microseconds).
+
+Run from api/:  python -m bench.bench_loop_lag [--vectors 5000]
+
+Three paths upsert the same vectors while a probe wakes every --interval ms
+and records how late it was woken:
+  blocking  the old path: one synchronous Upstash call on the event loop
+  upstash   UpstashStore (AsyncIndex, batched and concurrent)
+  local     LocalStore (numpy work in a thread)
+Upstash is replaced by a stand-in that charges --rtt-ms per request plus
+--mbps for the payload, so no network or credentials are needed.
+"""
+
+from services.store import LocalStore, UpstashStore
+
+from upstash_vector import Vector
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+import numpy as np
+
+
+class StandInIndex:
+    """AsyncIndex look-alike whose upsert costs a round trip plus transfer time"""
+
+    def __init__(self, rtt: float, bytes_per_second: float):
+        self.rtt = rtt
+        self.bytes_per_second = bytes_per_second
+        self.requests = 0
+
+    def cost(self, vectors) -> float:
+        payload = sum(12 * len(v.vector) + len(str(v.metadata)) for v in vectors)
+        return self.rtt + payload / self.bytes_per_second
+
+    async def upsert(self, vectors, namespace: str = ""):
+        self.requests += 1
+        await asyncio.sleep(self.cost(vectors))
+
+
+def make_vectors(n: int, dim: int = 384) -> list:
+    rng = np.random.default_rng(0)
+    matrix = rng.standard_normal((n, dim)).astype(np.float32)
+    return [
+        Vector(id=f"bench_{i}", vector=row.tolist(), metadata={"text": "x" * 800})
+        for i, row in enumerate(matrix)
+    ]
+
+
+async def probe(interval: float, lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def measure(upsert, interval: float) -> dict:
+    lags, stop = [], asyncio.Event()
+    task = asyncio.create_task(probe(interval, lags, stop))
+    await asyncio.sleep(interval * 5)
+
+    start = time.perf_counter()
+    await upsert()
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await task
+    lags.sort()
+    return {
+        "upsert_s": elapsed,
+        "p50_ms": 1000 * statistics.median(lags),
+        "p99_ms": 1000 * lags[min(len(lags) - 1, int(0.99 * len(lags)))],
+        "max_ms": 1000 * lags[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=5000)
+    parser.add_argument("--interval", type=float, default=10.0, help="Probe ms")
+    parser.add_argument("--rtt-ms", type=float, default=80.0)
+    parser.add_argument("--mbps", type=float, default=50.0)
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.vectors)
+    interval = args.interval / 1000
+    index = StandInIndex(args.rtt_ms / 1000, args.mbps * 1e6 / 8)
+
+    async def blocking():
+        time.sleep(index.cost(vectors))
+
+    async def upstash():
+        store = UpstashStore(url="https://stand-in.upstash.io", token="stand-in")
+        store.index = index
+        await store.upsert(vectors, "bench")
+
+    async def local():
+        with tempfile.TemporaryDirectory() as directory:
+            await LocalStore(directory=directory).upsert(vectors, "bench")
+
+    print(f"{'path':>9} {'upsert s':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, upsert in (
+        ("blocking", blocking),
+        ("upstash", upstash),
+        ("local", local),
+    ):
+        row = asyncio.run(measure(upsert, interval))
+        print(
+            f"{name:>9} {row['upsert_s']:>9.2f} {row['p50_ms']:>8.1f} "
+            f"{row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
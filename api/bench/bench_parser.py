@@ -0,0 +1,69 @@
+"""
+Wall-clock time of serial vs page-parallel markdown extraction.
+
+Run from api/:  python -m bench.bench_parser [--pages 16 64 128 256]
+"""
+
+from services.parser import PDFParser, page_ranges
+
+import argparse
+import asyncio
+import time
+import pymupdf
+
+PARAGRAPH = (
+    "Dense retrieval maps queries and passages into a shared vector space "
+    "and ranks passages by inner product with the query. "
+) * 6
+
+
+def synthetic_pdf(pages: int) -> bytes:
+    doc = pymupdf.open()
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Section {i + 1}", fontsize=16)
+        page.insert_textbox(pymupdf.Rect(72, 100, 520, 760), PARAGRAPH * 3)
+    return doc.tobytes()
+
+
+async def run(page_counts: list[int], pages_per_job: int, workers: int):
+    parser = PDFParser(workers=workers, queue_size=0, timeout=600)
+    # Spawn the workers and import pymupdf4llm in them before timing anything
+    await parser.ranges_to_markdown(synthetic_pdf(workers), page_ranges(workers, 1))
+    print(
+        f"{'pages':>6} {'ranges':>7} {'serial s':>9} {'parallel s':>11} {'speedup':>8}"
+    )
+    try:
+        for pages in page_counts:
+            pdf_bytes = synthetic_pdf(pages)
+            ranges = page_ranges(pages, pages_per_job)
+
+            start = time.perf_counter()
+            await parser.to_markdown(pdf_bytes)
+            serial = time.perf_counter() - start
+
+            start = time.perf_counter()
+            results = await parser.ranges_to_markdown(pdf_bytes, ranges)
+            parallel = time.perf_counter() - start
+            failed = [r for r in results if isinstance(r, BaseException)]
+            if failed:
+                raise failed[0]
+
+            print(
+                f"{pages:>6} {len(ranges):>7} {serial:>9.2f} {parallel:>11.2f} {serial / parallel:>7.2f}x"
+            )
+    finally:
+        parser.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[16, 64, 128, 256])
+    parser.add_argument("--pages-per-job", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=PDFParser().workers)
+    args = parser.parse_args()
+    asyncio.run(run(args.pages, args.pages_per_job, args.workers))
+
+
+if __name__ == "__main__":
+    main()
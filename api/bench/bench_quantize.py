@@ -0,0 +1,140 @@
+"""
+Recall@k of quantized vector storage against the float32 baseline, with
+the storage and cache size of each mode.
+
+Run from api/:  python -m bench.bench_quantize [--k 5 10] [--corpus chunks.txt]
+
+Every mode is loaded into a LocalStore and queried with the same vectors;
+recall@k is the share of the float32 top k that each mode also returns.
+Stored bytes count every array the mode keeps on disk, including the
+scales and, with rescoring, the float32 copy.
+By default the corpus is synthetic: clustered, anisotropic vectors shaped
+like MiniLM embeddings of paper chunks, with queries near the clusters.
+--corpus embeds one chunk per line of a text file with the real model.
+"""
+
+from config import EMB_MODEL, VECTOR_RESCORE_OVERSAMPLE
+from services.quantize import to_bytes
+from services.store import LocalStore
+
+from upstash_vector import Vector
+import argparse
+import asyncio
+import os
+import tempfile
+import numpy as np
+
+MODES = [
+    ("float32", "none", False),
+    ("float16", "float16", False),
+    ("int8", "int8", False),
+    ("int8+rescore", "int8", True),
+]
+
+
+def synthetic_corpus(n: int, queries: int, dim: int = 384, clusters: int = 40):
+    rng = np.random.default_rng(0)
+    # A shared offset and uneven per-dimension spread, as in sentence embeddings
+    offset = rng.standard_normal(dim) * 0.5
+    spread = rng.gamma(2.0, 0.5, dim)
+    centers = rng.standard_normal((clusters, dim)) * spread + offset
+    labels = rng.integers(clusters, size=n + queries)
+    points = centers[labels] + rng.standard_normal((n + queries, dim)) * spread * 0.6
+    return points[:n].astype(np.float32), points[n:].astype(np.float32)
+
+
+def embedded_corpus(path: str, queries: int):
+    from light_embed import TextEmbedding
+
+    with open(path) as f:
+        chunks = [line.strip() for line in f if line.strip()]
+    rng = np.random.default_rng(0)
+    asked = rng.choice(len(chunks), size=min(queries, len(chunks)), replace=False)
+    # Query with the first half of a chunk, as a question about it would
+    questions = [
+        " ".join(chunks[i].split()[: len(chunks[i].split()) // 2 + 1]) for i in asked
+    ]
+    model = TextEmbedding(EMB_MODEL)
+    return np.asarray(model.encode(chunks)), np.asarray(model.encode(questions))
+
+
+async def top_ids(store: LocalStore, queries, k: int) -> list:
+    results = []
+    for query in queries:
+        matches = await store.query(query.tolist(), k, "bench")
+        results.append([match.id for match in matches])
+    return results
+
+
+def _vector_bytes(path: str) -> int:
+    """On-disk size of every array LocalStore keeps: matrix, scales, full copy"""
+    return sum(
+        os.path.getsize(os.path.join(path, name))
+        for name in os.listdir(path)
+        if name.endswith(".npy")
+    )
+
+
+async def run(corpus, queries, ks: list) -> list:
+    vectors = [
+        Vector(id=str(i), vector=row.tolist(), metadata={})
+        for i, row in enumerate(corpus)
+    ]
+    top_k = max(ks)
+    rows, baseline = [], None
+    for name, quantization, rescore in MODES:
+        with tempfile.TemporaryDirectory() as directory:
+            store = LocalStore(directory, quantization=quantization, rescore=rescore)
+            await store.upsert(vectors, "bench")
+            found = await top_ids(store, queries, top_k)
+            vector_bytes = _vector_bytes(os.path.join(directory, "bench"))
+        if baseline is None:
+            baseline = found
+
+        recalls = {
+            k: np.mean(
+                [len(set(a[:k]) & set(b[:k])) / k for a, b in zip(found, baseline)]
+            )
+            for k in ks
+        }
+        rows.append(
+            {
+                "mode": name,
+                "recalls": recalls,
+                "bytes_per_vector": vector_bytes / len(corpus),
+                "cache_bytes": len(to_bytes(corpus[0], quantization)),
+            }
+        )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 5, 10])
+    parser.add_argument("--vectors", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--corpus", help="Text file with one chunk per line")
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus, queries = embedded_corpus(args.corpus, args.queries)
+    else:
+        corpus, queries = synthetic_corpus(args.vectors, args.queries)
+
+    rows = asyncio.run(run(corpus, queries, args.k))
+    print(
+        f"{len(corpus)} vectors, {len(queries)} queries, "
+        f"rescore oversample {VECTOR_RESCORE_OVERSAMPLE}x"
+    )
+    header = "".join(f"{f'recall@{k}':>11}" for k in args.k)
+    print(f"{'mode':>13}{header} {'store B/vec':>12} {'cache B':>8}")
+    for row in rows:
+        recalls = "".join(f"{row['recalls'][k]:>11.3f}" for k in args.k)
+        print(
+            f"{row['mode']:>13}{recalls} {row['bytes_per_vector']:>12.0f} "
+            f"{row['cache_bytes']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
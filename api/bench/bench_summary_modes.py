@@ -0,0 +1,245 @@
+"""
+Compare the split (four calls) and combined (one call) summary modes:
+total tokens, latency and failure rate, replayed from a recorded model.
+
+Record real Gemini responses for a paper once (needs GEMINI_API_KEY):
+    python -m bench.bench_summary_modes --record 1706.03762 -o recording.json
+Replay them against a stand-in model as often as needed:
+    python -m bench.bench_summary_modes --recording recording.json --trials 50
+
+Without --recording a synthetic recording is used. --fail-rate and
+--truncate-rate inject errors and MAX_TOKENS truncations into the replay.
+"""
+
+from services import extract
+from services.acquire import ArxivPDF
+from services.extract import Extractor, summary_mode_stats
+from models import (
+    EndResponse,
+    OverallSummary,
+    TermsAndSummaries,
+    FigureSummaries,
+    Citations,
+)
+
+from google.genai import types
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+SCHEMAS = [OverallSummary, TermsAndSummaries, FigureSummaries, Citations, EndResponse]
+
+
+class RecordingModels:
+    """Forwards generate_content to Gemini and records every response"""
+
+    def __init__(self, models):
+        self.models = models
+        self.calls = {}
+
+    async def generate_content(self, *, model, contents, config):
+        start = time.perf_counter()
+        response = await self.models.generate_content(
+            model=model, contents=contents, config=config
+        )
+        usage = response.usage_metadata
+        candidate = response.candidates[0] if response.candidates else None
+        self.calls[config["response_schema"].__name__] = {
+            "text": response.text,
+            "finish_reason": candidate.finish_reason.name if candidate else None,
+            "prompt_tokens": usage.prompt_token_count if usage else 0,
+            "output_tokens": usage.candidates_token_count if usage else 0,
+            "latency": time.perf_counter() - start,
+        }
+        return response
+
+
+class StandInModels:
+    """Replays a recording, with optional injected failures and truncations"""
+
+    def __init__(self, recording: dict, fail_rate: float, truncate_rate: float, rng):
+        self.recording = recording
+        self.fail_rate = fail_rate
+        self.truncate_rate = truncate_rate
+        self.rng = rng
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.calls = 0
+
+    async def generate_content(self, *, model, contents, config):
+        call = self.recording[config["response_schema"].__name__]
+        self.calls += 1
+        self.prompt_tokens += call["prompt_tokens"]
+        await asyncio.sleep(call["latency"])
+
+        if self.rng.random() < self.fail_rate:
+            raise RuntimeError("Injected model failure")
+
+        text, finish_reason = call["text"], call["finish_reason"] or "STOP"
+        self.output_tokens += call["output_tokens"]
+        if self.rng.random() < self.truncate_rate:
+            text, finish_reason = text[: len(text) // 2], "MAX_TOKENS"
+
+        return types.GenerateContentResponse(
+            candidates=[
+                types.Candidate(
+                    content=types.Content(role="model", parts=[types.Part(text=text)]),
+                    finish_reason=types.FinishReason[finish_reason],
+                )
+            ]
+        )
+
+
+class _Client:
+    def __init__(self, models):
+        self.aio = type("aio", (), {"models": models})()
+
+
+def synthetic_recording() -> dict:
+    summary = {
+        "summary": "A paper about retrieval. " * 60,
+        "context": "Information Retrieval",
+    }
+    terms = {
+        "key_terms": ["Embedding", "Vector Search", "Recall"],
+        "abs_explanation": "The abstract explained. " * 80,
+        "meth_explanation": "The method explained. " * 120,
+        "conc_explanation": "The conclusion explained. " * 60,
+    }
+    figures = {
+        "table_and_figure_summaries": [
+            {"figure_num": f"Figure {i}", "figure_summary": "A plot. " * 40}
+            for i in range(1, 6)
+        ]
+    }
+    citations = {"citations": [f"Author {i}. Title. 2020." for i in range(40)]}
+    combined = {
+        "overall_summary": summary,
+        "terms_and_summaries": terms,
+        "table_and_figure_summaries": figures,
+        "citations": citations,
+    }
+
+    def call(data: dict, latency: float) -> dict:
+        text = json.dumps(data)
+        return {
+            "text": text,
+            "finish_reason": "STOP",
+            # A 12-page paper is ~9k input tokens; ~4 characters per output token
+            "prompt_tokens": 9000,
+            "output_tokens": len(text) // 4,
+            "latency": latency,
+        }
+
+    return {
+        "OverallSummary": call(summary, 0.35),
+        "TermsAndSummaries": call(terms, 0.6),
+        "FigureSummaries": call(figures, 0.45),
+        "Citations": call(citations, 0.4),
+        "EndResponse": call(combined, 1.1),
+    }
+
+
+def _extractor(pdf_bytes: bytes, mode: str) -> Extractor:
+    extract.GEMINI_UPLOAD_PDFS = False
+    if not extract.GEM_KEY:
+        # The client is replaced before use; genai only requires a key to exist
+        extract.GEM_KEY = "stand-in"
+    return Extractor(pdf_bytes, mode=mode)
+
+
+async def record(arxiv_id: str) -> dict:
+    async with ArxivPDF(arxiv_id) as pdf:
+        pdf_bytes = await pdf.fetch_arxiv_pdf_bytes()
+    if not pdf_bytes:
+        raise SystemExit(f"Could not fetch {arxiv_id}")
+
+    calls = {}
+    for mode in ("split", "combined"):
+        extractor = _extractor(pdf_bytes, mode)
+        models = RecordingModels(extractor.client.aio.models)
+        extractor.client = _Client(models)
+        await extractor.get_all_summaries()
+        calls.update(models.calls)
+
+    missing = [schema.__name__ for schema in SCHEMAS if schema.__name__ not in calls]
+    if missing:
+        raise SystemExit(f"No recorded response for {', '.join(missing)}")
+    return calls
+
+
+async def replay(recording: dict, mode: str, trials: int, args) -> dict:
+    rng = random.Random(args.seed)
+    latencies, failures = [], 0
+    prompt_tokens = output_tokens = calls = 0
+    fallbacks_before = summary_mode_stats["combined_fallbacks"]
+
+    for _ in range(trials):
+        models = StandInModels(recording, args.fail_rate, args.truncate_rate, rng)
+        extractor = _extractor(b"%PDF-stand-in", mode)
+        extractor.client = _Client(models)
+
+        start = time.perf_counter()
+        result = await extractor.get_all_summaries()
+        latencies.append(time.perf_counter() - start)
+
+        failures += result is None
+        prompt_tokens += models.prompt_tokens
+        output_tokens += models.output_tokens
+        calls += models.calls
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "calls": calls / trials,
+        "prompt_tokens": prompt_tokens / trials,
+        "output_tokens": output_tokens / trials,
+        "p50_s": statistics.median(latencies),
+        "p95_s": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+        "failure_rate": failures / trials,
+        "fallbacks": summary_mode_stats["combined_fallbacks"] - fallbacks_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--record", metavar="ARXIV_ID")
+    parser.add_argument("-o", "--output", default="recording.json")
+    parser.add_argument("--recording", help="Recording to replay")
+    parser.add_argument("--trials", type=int, default=20)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--truncate-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.record:
+        calls = asyncio.run(record(args.record))
+        with open(args.output, "w") as f:
+            json.dump(calls, f, indent=2)
+        print(f"Recorded {len(calls)} responses to {args.output}")
+        return
+
+    if args.recording:
+        with open(args.recording) as f:
+            recording = json.load(f)
+    else:
+        recording = synthetic_recording()
+
+    print(
+        f"{'mode':>9} {'calls':>6} {'in tok':>8} {'out tok':>8} "
+        f"{'p50 s':>7} {'p95 s':>7} {'fail':>6} {'fallbacks':>10}"
+    )
+    for mode in ("split", "combined"):
+        row = asyncio.run(replay(recording, mode, args.trials, args))
+        print(
+            f"{row['mode']:>9} {row['calls']:>6.2f} {row['prompt_tokens']:>8.0f} "
+            f"{row['output_tokens']:>8.0f} {row['p50_s']:>7.2f} {row['p95_s']:>7.2f} "
+            f"{row['failure_rate']:>6.1%} {row['fallbacks']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 LOG_CONFIG = {
@@ -38,7 +39,80 @@ TOKENIZING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 EMB_MODEL = "sentence-transformers/all-MiniLM-L12-v2"
 GEM_MODEL = "gemini-2.0-flash-lite"
 SEARCH_API = os.getenv("SEARCH_API")
+FEED_HTTP2 = os.getenv("FEED_HTTP2", "true").lower() == "true"
+FEED_MAX_CONNECTIONS = int(os.getenv("FEED_MAX_CONNECTIONS", 50))
+FEED_MAX_KEEPALIVE = int(os.getenv("FEED_MAX_KEEPALIVE", 20))
+FEED_KEEPALIVE_EXPIRY = float(os.getenv("FEED_KEEPALIVE_EXPIRY", 60))
+FEED_CONNECT_TIMEOUT = float(os.getenv("FEED_CONNECT_TIMEOUT", 3))
+FEED_TIMEOUT = float(os.getenv("FEED_TIMEOUT", 10))
+FEED_LEG_TIMEOUT = float(os.getenv("FEED_LEG_TIMEOUT", 12))
+FEED_HEDGE_PERCENTILE = float(os.getenv("FEED_HEDGE_PERCENTILE", 95))
+FEED_HEDGE_MIN_DELAY = float(os.getenv("FEED_HEDGE_MIN_DELAY", 0.25))
+FEED_LATENCY_WINDOW = int(os.getenv("FEED_LATENCY_WINDOW", 200))
+FEED_POOL_ENABLED = os.getenv("FEED_POOL_ENABLED", "true").lower() == "true"
+FEED_POOL_SIZE = int(os.getenv("FEED_POOL_SIZE", 200))
+FEED_POOL_REFRESH_INTERVAL = float(os.getenv("FEED_POOL_REFRESH_INTERVAL", 15 * 60))
+FEED_POOL_CONCURRENCY = int(os.getenv("FEED_POOL_CONCURRENCY", 4))
+FEED_POOL_STARTUP_TIMEOUT = float(os.getenv("FEED_POOL_STARTUP_TIMEOUT", 20))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 2000))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", 5 * 60))
+SIMILAR_CACHE_TTL = float(os.getenv("SIMILAR_CACHE_TTL", 60 * 60))
+RESPONSE_CACHE_STALE_TTL = float(os.getenv("RESPONSE_CACHE_STALE_TTL", 30 * 60))
 CACHE_SIZE = 1000
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(tempfile.gettempdir(), "densair"))
+VEC_SERVICE_CACHE_SIZE = int(os.getenv("VEC_SERVICE_CACHE_SIZE", 256))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 32))
+EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", 5))
+EMBED_MAX_CONCURRENT_BATCHES = int(os.getenv("EMBED_MAX_CONCURRENT_BATCHES", 2))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 64))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", 2))
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", 100))
+UPSERT_MAX_BYTES = int(os.getenv("UPSERT_MAX_BYTES", 1024 * 1024))
+UPSERT_CONCURRENCY = int(os.getenv("UPSERT_CONCURRENCY", 4))
+UPSERT_RETRIES = int(os.getenv("UPSERT_RETRIES", 3))
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "upstash").lower()
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", os.path.join(CACHE_DIR, "vectors"))
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "float16").lower()
+VECTOR_RESCORE = os.getenv("VECTOR_RESCORE", "false").lower() == "true"
+VECTOR_RESCORE_OVERSAMPLE = int(os.getenv("VECTOR_RESCORE_OVERSAMPLE", 4))
+VECTOR_STORE_CACHE_SIZE = int(os.getenv("VECTOR_STORE_CACHE_SIZE", 64))
+MANIFEST_PATH = os.getenv("MANIFEST_PATH", os.path.join(CACHE_DIR, "manifest.json"))
+MANIFEST_TTL = float(os.getenv("MANIFEST_TTL", 6 * 60 * 60))
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH", os.path.join(CACHE_DIR, "embeddings.sqlite3")
+)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 500_000))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", 5000))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", 24 * 60 * 60))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", 128))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.92))
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", 1536))
+RAG_DEDUP_THRESHOLD = float(os.getenv("RAG_DEDUP_THRESHOLD", 0.8))
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", 50 * 1024 * 1024))
+PDF_FETCH_TIMEOUT = float(os.getenv("PDF_FETCH_TIMEOUT", 60))
+PDF_POOL_LIMIT = int(os.getenv("PDF_POOL_LIMIT", 20))
+ARXIV_LATEST_TTL = float(os.getenv("ARXIV_LATEST_TTL", 24 * 60 * 60))
+MARKDOWN_CACHE_MAX_BYTES = int(os.getenv("MARKDOWN_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+MARKDOWN_MEMORY_CACHE_BYTES = int(
+    os.getenv("MARKDOWN_MEMORY_CACHE_BYTES", 64 * 1024 * 1024)
+)
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", 1)))
+PARSER_WORKERS = int(
+    os.getenv("PARSER_WORKERS", max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY))
+)
+PARSER_QUEUE_SIZE = int(os.getenv("PARSER_QUEUE_SIZE", max(2, 8 // WEB_CONCURRENCY)))
+PARSER_TIMEOUT = float(os.getenv("PARSER_TIMEOUT", 120))
+PARSER_MAX_TASKS_PER_CHILD = int(os.getenv("PARSER_MAX_TASKS_PER_CHILD", 20))
+PARSER_PAGES_PER_JOB = int(os.getenv("PARSER_PAGES_PER_JOB", 16))
+SUMMARY_CACHE_MAX_BYTES = int(os.getenv("SUMMARY_CACHE_MAX_BYTES", 128 * 1024 * 1024))
+SUMMARY_MEMORY_CACHE_BYTES = int(
+    os.getenv("SUMMARY_MEMORY_CACHE_BYTES", 16 * 1024 * 1024)
+)
+GEMINI_UPLOAD_PDFS = os.getenv("GEMINI_UPLOAD_PDFS", "true").lower() == "true"
+GEMINI_FILE_TTL = int(os.getenv("GEMINI_FILE_TTL", 47 * 60 * 60))
+GEMINI_FILE_CACHE_SIZE = int(os.getenv("GEMINI_FILE_CACHE_SIZE", 1000))
+SUMMARY_MODE = os.getenv("SUMMARY_MODE", "split").lower()
 OLD_ARXIV_ID_PATTERN = r"^\d{4}\.\d{4,5}(v\d+)?$"
 NEW_ARXIV_ID_PATTERN = r"^[a-z\-]+(\.[A-Z]{2})?\/\d{7}(v\d+)?$"
 
@@ -90,6 +164,10 @@ You are an expert assistant answering questions about research papers.
 Use clear, confident, academic language at all times.
 """
 
+RAG_USER_PROMPT = (
+    "Answer the question: {query}. Use only information provided here: {context}"
+)
+
 VOICE_PROMPT = """
 You are a sauvant at generating extensive, engaging, and spoken-style motivations to read academic papers. Your goal is to create an excerpt that feels natural when read aloud, motivates one to read the given research paper, avoiding excessive technical jargon while preserving key insights. The tone should be clear, professional, yet conversational—imagine explaining the paper to an intelligent listener who is not an expert but is curious about the topic. Keep the `summary` output within 2000 characters. Give the title of the paper in the `title` field of the output. Keep the title catchy and short.
 ## Tone & Style:
@@ -107,3 +185,16 @@ You will be provided with the text of a research paper and must generate a struc
 ### **Guidelines for Output Quality**
 - **Clarity and Coherence:** Ensure that the citations are in Chicago style/format. Keep in mind the distinctions for citations of Books, Articles, Conference Papers, Websites and Theses.
 """
+
+COMBINED_PROMPT = f"""
+You are an AI research assistant. You will be provided with a research paper and must produce a single JSON object with exactly four keys, `overall_summary`, `terms_and_summaries`, `table_and_figure_summaries` and `citations`, following the instructions for each key below. Complete every key; do not stop after the first ones.
+
+## `overall_summary`
+{THIRD_PROMPT}
+## `terms_and_summaries`
+{FIRST_PROMPT}
+## `table_and_figure_summaries`
+{SECOND_PROMPT}
+## `citations`
+{CITATIONS_PROMPT}
+"""
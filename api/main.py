@@ -1,16 +1,36 @@
-from config import LOG_CONFIG, API_KEY, OLD_ARXIV_ID_PATTERN, NEW_ARXIV_ID_PATTERN
+from config import (
+    LOG_CONFIG,
+    API_KEY,
+    OLD_ARXIV_ID_PATTERN,
+    NEW_ARXIV_ID_PATTERN,
+    SEARCH_API,
+)
 
-from services.acquire import ArxivPDF
-from services.extract import Extractor
+from services.acquire import ArxivPDF, pdf_cache, markdown_cache
+from services.extract import Extractor, summary_mode_stats
 from services.search import TermSearcher
 from services.vector import VecService
-from services.feed import Feed
+from services.registry import get_registry, registry_loaded
+from services.answers import answer_cache
+from services.manifest import manifest
+from services.feed import (
+    Feed,
+    search_latency,
+    search_cache,
+    similar_cache,
+    search_cache_key,
+    similar_cache_key,
+)
+from services.feedpool import feed_pool
+from services.parser import pdf_parser, ParserBusyError
+from services.summaries import summary_store
 
 import io
 import re
+import json
 import time
 import asyncio
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator
 from functools import lru_cache
 from slowapi import Limiter
 from slowapi.util import get_remote_address
@@ -22,7 +42,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import logging.config
 
-from models import SearchResult, QueryRequest
+from models import SearchResult, QueryRequest, EndResponse
 
 logging.config.dictConfig(LOG_CONFIG)
 logger = logging.getLogger(__name__)
@@ -51,8 +71,23 @@ limiter = Limiter(
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Starting DensAIR API server")
-    yield
-    logger.info("Shutting down DensAIR API server")
+    try:
+        await ArxivPDF.open_shared_session()
+        pdf_parser.start()
+        await asyncio.to_thread(get_registry)
+        if SEARCH_API:
+            await Feed.open_shared_client()
+            await feed_pool.start(Feed.fetch_domain)
+        else:
+            logger.warning("SEARCH_API is not set, feed and search routes will fail")
+        yield
+    finally:
+        # Each close is a no-op for whatever startup did not get to open
+        logger.info("Shutting down DensAIR API server")
+        await feed_pool.stop()
+        await ArxivPDF.close_shared_session()
+        await Feed.close_shared_client()
+        pdf_parser.shutdown()
 
 
 app = FastAPI(
@@ -134,6 +169,9 @@ async def track_requests(request: Request, call_next):
 async def process_pdf(
     request: Request,
     arxiv_id: str,
+    stream: bool = Query(
+        False, description="Stream sections as NDJSON as soon as each is ready"
+    ),
     _: str = Depends(verify_api_key),
 ):
     """Process a PDF and return summaries of its content"""
@@ -154,33 +192,35 @@ async def process_pdf(
             detail="Invalid arXiv ID format. Expected format like '1501.00001' or 'math/0211159'",
         )
 
+    if stream:
+        return StreamingResponse(
+            _stream_summaries(arxiv_id), media_type="application/x-ndjson"
+        )
+
+    cached = await summary_store.get(arxiv_id)
+    if cached is not None:
+        logger.info(f"Summaries for {arxiv_id} served from store")
+        return cached
+
     try:
-        async with ArxivPDF(arxiv_id) as pdf:
-            try:
-                pdf_bytes = await pdf.fetch_arxiv_pdf_bytes()
-            except Exception as fetch_error:
-                logger.error(f"Error fetching PDF {arxiv_id}: {fetch_error}")
-                raise HTTPException(
-                    status_code=404,
-                    detail="Could not fetch PDF. Please check the arXiv ID and try again.",
-                )
+        summaries = await asyncio.wait_for(
+            summary_store.get_or_generate(
+                arxiv_id, lambda: _generate_summaries(arxiv_id)
+            ),
+            timeout=100.0,
+        )
+        if summaries is None:
+            raise HTTPException(status_code=500, detail="Failed to process PDF")
 
-        try:
-            extractor = Extractor(pdf_bytes)
-            summaries = await asyncio.wait_for(
-                extractor.get_all_summaries(),
-                timeout=100.0,
-            )
-            logger.info(f"PDF {arxiv_id} processed in {time.time() - start_time:.2f}s")
-            return summaries
-
-        except asyncio.TimeoutError:
-            logger.error(f"Timeout processing PDF {arxiv_id}")
-            raise HTTPException(
-                status_code=408,
-                detail="Processing timed out. The PDF may be too large or complex.",
-            )
+        logger.info(f"PDF {arxiv_id} processed in {time.time() - start_time:.2f}s")
+        return summaries
 
+    except asyncio.TimeoutError:
+        logger.error(f"Timeout processing PDF {arxiv_id}")
+        raise HTTPException(
+            status_code=408,
+            detail="Processing timed out. The PDF may be too large or complex.",
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -188,6 +228,94 @@ async def process_pdf(
         raise HTTPException(status_code=500, detail="Failed to process PDF")
 
 
+async def _generate_summaries(arxiv_id: str) -> Optional[EndResponse]:
+    """Fetch the PDF and run all Gemini summaries; shared by coalesced requests"""
+    async with ArxivPDF(arxiv_id) as pdf:
+        try:
+            pdf_bytes = await pdf.fetch_arxiv_pdf_bytes()
+        except Exception as fetch_error:
+            logger.error(f"Error fetching PDF {arxiv_id}: {fetch_error}")
+            pdf_bytes = None
+
+    if not pdf_bytes:
+        raise HTTPException(
+            status_code=404,
+            detail="Could not fetch PDF. Please check the arXiv ID and try again.",
+        )
+
+    extractor = Extractor(pdf_bytes)
+    return await extractor.get_all_summaries()
+
+
+async def _stream_summaries(arxiv_id: str) -> AsyncIterator[str]:
+    """
+    Yield one NDJSON event per EndResponse section as it completes, an error
+    event for each section that fails, and a final 'done' event.
+    """
+
+    def event(**fields) -> str:
+        return json.dumps(fields) + "\n"
+
+    cached = await summary_store.get(arxiv_id)
+    if cached is not None:
+        for section, data in cached.model_dump().items():
+            yield event(event="section", section=section, data=data)
+        yield event(event="done", cached=True)
+        return
+
+    async for section, data, error in summary_store.stream_or_generate(
+        arxiv_id, lambda: _generate_sections(arxiv_id)
+    ):
+        if error:
+            yield event(event="error", section=section, message=error)
+        else:
+            yield event(event="section", section=section, data=data)
+
+    yield event(event="done", cached=False)
+
+
+async def _generate_sections(arxiv_id: str) -> AsyncIterator[tuple]:
+    """
+    Fetch the PDF and yield (section, data, error) as each Gemini summary
+    finishes; shared by every stream of the same paper. A fetch failure is
+    reported with section None.
+    """
+    try:
+        async with ArxivPDF(arxiv_id) as pdf:
+            pdf_bytes = await pdf.fetch_arxiv_pdf_bytes()
+    except Exception as fetch_error:
+        logger.error(f"Error fetching PDF {arxiv_id}: {fetch_error}")
+        pdf_bytes = None
+
+    if not pdf_bytes:
+        yield None, None, "Could not fetch PDF. Please check the arXiv ID and try again."
+        return
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + 100.0
+    pending = set(EndResponse.model_fields)
+
+    sections = Extractor(pdf_bytes).iter_summaries()
+    try:
+        while pending:
+            try:
+                section, data, error = await asyncio.wait_for(
+                    sections.__anext__(), timeout=max(deadline - loop.time(), 0)
+                )
+            except StopAsyncIteration:
+                break
+            except asyncio.TimeoutError:
+                logger.error(f"Timeout streaming summaries for {arxiv_id}")
+                for section in sorted(pending):
+                    yield section, None, "Timed out"
+                break
+
+            pending.discard(section)
+            yield section, data, error
+    finally:
+        await sections.aclose()
+
+
 @app.get("/audiosumm/{arxiv_id}")
 @limiter.limit("1/day")
 async def get_aud_summ(
@@ -248,22 +376,30 @@ async def process_paper(
 
     vec = VecService(arxiv_id)
 
-    if await vec.vectors_exist():
+    if await vec.is_ready():
         return {
             "status": "success",
             "message": f"{arxiv_id} was already processed; vectors are ready.",
         }
 
-    vectors = await vec.chunk_and_embed_pdf()
-    if not vectors:
+    try:
+        inserted = await vec.ingest_pdf()
+    except ParserBusyError as e:
+        logger.warning(f"Shedding /process for {arxiv_id}: {e}")
         raise HTTPException(
-            status_code=500, detail="Failed to extract text or create embeddings."
+            status_code=503,
+            detail="PDF parser is busy. Please try again shortly.",
+            headers={"Retry-After": "10"},
         )
-
-    try:
-        await vec.insert_vectors(vectors)
     except Exception as e:
+        logger.error(f"Failed to ingest {arxiv_id}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to insert vectors: {e}")
+
+    if not inserted:
+        raise HTTPException(
+            status_code=500, detail="Failed to extract text or create embeddings."
+        )
+
     return {
         "status": "success",
         "message": f"{arxiv_id} processed successfully and is ready for queries.",
@@ -272,19 +408,30 @@ async def process_paper(
 
 @app.post("/query/{arxiv_id:path}")
 async def query_paper(
+    request: Request,
     arxiv_id: str = Path(..., min_length=6, description="arXiv paper ID"),
     payload: QueryRequest = Body(...),
+    stream: bool = Query(False, description="Stream the answer over SSE"),
     _: str = Depends(verify_api_key),
 ):
     start = time.time()
     arxiv_id = arxiv_id.strip().lower()
 
-    if not await VecService(arxiv_id).vectors_exist():
+    vec = VecService(arxiv_id)
+
+    if not await vec.is_ready():
         raise HTTPException(400, "Paper not processed yet. Call /process first.")
 
+    if stream:
+        return StreamingResponse(
+            _stream_answer(request, arxiv_id, payload),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
     try:
         answer = await asyncio.wait_for(
-            VecService(arxiv_id).query_index(payload.query, payload.top_k), timeout=30.0
+            vec.query_index(payload.query, payload.top_k), timeout=30.0
         )
     except asyncio.TimeoutError:
         logger.error(f"Timeout for {arxiv_id}: {payload.query}")
@@ -297,6 +444,48 @@ async def query_paper(
     return {"status": "success", "answer": answer, "processing_time": elapsed}
 
 
+async def _stream_answer(
+    request: Request, arxiv_id: str, payload: QueryRequest
+) -> AsyncIterator[str]:
+    """
+    Relay answer tokens as SSE 'data' events, then a 'done' event. The 30s
+    deadline covers the whole answer, and the upstream Groq stream is closed
+    as soon as the client disconnects.
+    """
+    start = time.time()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + 30.0
+    tokens = VecService(arxiv_id).stream_answer(payload.query, payload.top_k)
+
+    try:
+        while True:
+            if await request.is_disconnected():
+                logger.info(f"Client disconnected while streaming {arxiv_id}")
+                return
+
+            try:
+                token = await asyncio.wait_for(
+                    tokens.__anext__(), timeout=max(deadline - loop.time(), 0)
+                )
+            except StopAsyncIteration:
+                break
+
+            yield f"data: {json.dumps({'token': token})}\n\n"
+    except asyncio.TimeoutError:
+        logger.error(f"Timeout for {arxiv_id}: {payload.query}")
+        yield f"event: error\ndata: {json.dumps({'detail': 'Query timed out. Try a simpler question.'})}\n\n"
+        return
+    except Exception as e:
+        logger.exception(f"Error streaming answer for {arxiv_id}", exc_info=e)
+        yield f"event: error\ndata: {json.dumps({'detail': 'Internal Server Error during vector search'})}\n\n"
+        return
+    finally:
+        await tokens.aclose()
+
+    elapsed = round(time.time() - start, 2)
+    yield f"event: done\ndata: {json.dumps({'processing_time': elapsed})}\n\n"
+
+
 @app.get("/feed", response_model=List[SearchResult])
 @limiter.limit("40/minute")
 async def get_user_feed(
@@ -366,24 +555,30 @@ async def search_papers(
 
     categories = [cat.strip().lower() for cat in categories or [] if cat.strip()]
 
-    try:
+    async def _search():
         async with Feed() as feed:
-            results = await asyncio.wait_for(
-                feed.search_papers_request(
-                    query=query,
-                    categories=categories,
-                    categories_match_all=categories_match_all,
-                    date_from=date_from,
-                    date_to=date_to,
-                    limit=limit,
-                ),
-                timeout=10.0,
+            return await feed.search_papers_request(
+                query=query,
+                categories=categories,
+                categories_match_all=categories_match_all,
+                date_from=date_from,
+                date_to=date_to,
+                limit=limit,
             )
 
-            logger.info(
-                f"Search returned {len(results)} results in {time.time() - start_time:.2f}s"
-            )
-            return results
+    key = search_cache_key(
+        query, categories, categories_match_all, date_from, date_to, limit
+    )
+
+    try:
+        results = await asyncio.wait_for(
+            search_cache.get_or_load(key, _search), timeout=10.0
+        )
+
+        logger.info(
+            f"Search returned {len(results)} results in {time.time() - start_time:.2f}s"
+        )
+        return results
 
     except asyncio.TimeoutError:
         logger.error(f"Timeout for search: query={query}, categories={categories}")
@@ -404,10 +599,15 @@ async def get_similar_feed(
     if not title.strip():
         raise HTTPException(status_code=400, detail="Title cannot be empty")
 
-    try:
+    async def _similar():
         async with Feed() as feed:
-            results = await feed.similar_to_title(title, top_k=limit + 1)
-            return results[1:]
+            return await feed.similar_to_title(title, top_k=limit + 1)
+
+    try:
+        results = await similar_cache.get_or_load(
+            similar_cache_key(title, limit + 1), _similar
+        )
+        return results[1:]
     except Exception as e:
         logger.error(
             f"Failed to get similar papers for title '{title}': {e}", exc_info=True
@@ -439,5 +639,24 @@ async def health_check():
     return {
         "status": "healthy",
         "active_requests": len(active_requests),
+        "caches": {
+            "pdf": pdf_cache.stats(),
+            "markdown": markdown_cache.stats(),
+            "summaries": summary_store.stats(),
+            "answers": answer_cache.stats(),
+            "search": search_cache.stats(),
+            "similar": similar_cache.stats(),
+        },
+        "manifest": manifest.stats(),
+        "feed_search": search_latency.stats(),
+        "feed_pool": feed_pool.stats(),
+        "pdf_parser": pdf_parser.stats(),
+        "summary_mode": summary_mode_stats,
+        "embedding_batcher": (
+            get_registry().batcher.stats() if registry_loaded() else None
+        ),
+        "embedding_cache": (
+            get_registry().embedding_cache.stats() if registry_loaded() else None
+        ),
         "timestamp": time.time(),
     }
@@ -90,6 +90,20 @@ class Citations(BaseModel):
     citations: List[str]
 
 
+class VectorMatch(BaseModel):
+    id: str
+    score: float = 0.0
+    metadata: Optional[dict] = None
+
+
+class ManifestEntry(BaseModel):
+    namespace: str
+    chunk_count: Optional[int] = None
+    embedding_model: Optional[str] = None
+    ingested_at: Optional[str] = None
+    verified_at: Optional[float] = None
+
+
 class QueryRequest(BaseModel):
     query: str
     top_k: int = 5
@@ -1,26 +1,120 @@
-from config import LOG_CONFIG
+from config import (
+    LOG_CONFIG,
+    CACHE_DIR,
+    PDF_CACHE_MAX_BYTES,
+    PDF_MAX_BYTES,
+    PDF_FETCH_TIMEOUT,
+    PDF_POOL_LIMIT,
+    ARXIV_LATEST_TTL,
+    MARKDOWN_CACHE_MAX_BYTES,
+    MARKDOWN_MEMORY_CACHE_BYTES,
+    PARSER_PAGES_PER_JOB,
+)
+
+from services.cache import DiskCache, TextCache
+from services.parser import (
+    pdf_parser,
+    pdf_page_count,
+    page_ranges,
+    ParserBusyError,
+)
 
 import aiohttp
 import asyncio
 import pymupdf
 import logging.config
-import tempfile
+import hashlib
 import os
-from pymupdf4llm import to_markdown
+import re
+from importlib.metadata import version
 
 logging.config.dictConfig(LOG_CONFIG)
 
+pdf_cache = DiskCache(
+    os.path.join(CACHE_DIR, "pdf"), PDF_CACHE_MAX_BYTES, suffix=".pdf"
+)
+
+markdown_cache = TextCache(
+    os.path.join(CACHE_DIR, "markdown"),
+    MARKDOWN_CACHE_MAX_BYTES,
+    MARKDOWN_MEMORY_CACHE_BYTES,
+)
+
+PYMUPDF4LLM_VERSION = version("pymupdf4llm")
+
+
+def markdown_cache_key(pdf_bytes: bytes) -> str:
+    """Markdown depends only on the PDF content and the parser version"""
+    digest = hashlib.sha256(pdf_bytes).hexdigest()
+    return f"{digest}:pymupdf4llm-{PYMUPDF4LLM_VERSION}"
+
+
+def canonical_arxiv_id(arxiv_id: str) -> str:
+    """Normalize an arXiv ID so every spelling of a paper maps to one cache key"""
+    arxiv_id = arxiv_id.strip().strip("/").lower()
+    arxiv_id = re.sub(r"^(arxiv:|https?://arxiv\.org/(abs|pdf)/)", "", arxiv_id)
+    arxiv_id = re.sub(r"\.pdf$", "", arxiv_id)
+    return arxiv_id
+
+
+def pdf_cache_key(arxiv_id: str) -> str:
+    """Cache key of the form '<id>v<n>', or '<id>@latest' when no version is pinned"""
+    canonical = canonical_arxiv_id(arxiv_id)
+    if re.search(r"v\d+$", canonical):
+        return canonical
+    return f"{canonical}@latest"
+
+
+def latest_max_age(cache_key: str) -> float | None:
+    """
+    Entries for unpinned IDs expire after ARXIV_LATEST_TTL so a new arXiv
+    version is picked up; pinned versions never change and never expire.
+    """
+    return ARXIV_LATEST_TTL if "@latest" in cache_key else None
+
+
+class PDFTooLargeError(Exception):
+    pass
+
 
 class ArxivPDF:
+    _shared_session: aiohttp.ClientSession | None = None
+
     def __init__(self, arxiv_id: str):
-        self.arxiv_url = f"https://arxiv.org/pdf/{arxiv_id}"
+        self.arxiv_id = canonical_arxiv_id(arxiv_id)
+        self.arxiv_url = f"https://arxiv.org/pdf/{self.arxiv_id}"
+        self.cache_key = pdf_cache_key(arxiv_id)
         self.logger = logging.getLogger(__name__)
         self._session = None
         self._pdf_bytes_cache = None
 
+    @classmethod
+    async def open_shared_session(cls):
+        """Create the keep-alive session shared by every ArxivPDF in this process"""
+        if cls._shared_session is None or cls._shared_session.closed:
+            cls._shared_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=PDF_POOL_LIMIT, keepalive_timeout=60
+                ),
+                timeout=aiohttp.ClientTimeout(total=PDF_FETCH_TIMEOUT),
+            )
+        return cls._shared_session
+
+    @classmethod
+    async def close_shared_session(cls):
+        if cls._shared_session is not None and not cls._shared_session.closed:
+            await cls._shared_session.close()
+        cls._shared_session = None
+
     async def _get_session(self):
+        shared = ArxivPDF._shared_session
+        if shared is not None and not shared.closed:
+            return shared
+
         if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession()
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=PDF_FETCH_TIMEOUT)
+            )
         return self._session
 
     async def close(self):
@@ -28,57 +122,43 @@ class ArxivPDF:
             await self._session.close()
             self._session = None
 
-    async def is_valid_pdf_url(self) -> bool:
-        try:
-            session = await self._get_session()
-            async with session.head(self.arxiv_url, allow_redirects=True) as response:
-                if response.status != 200:
-                    self.logger.error(f"URL returned status code {response.status}")
-                    return False
-
-                content_type = response.headers.get("Content-Type", "").lower()
-                if "pdf" not in content_type:
-                    self.logger.error("The file is not a PDF (Content-Type mismatch).")
-                    return False
-
-            session = await self._get_session()
-
-            async with session.get(
-                self.arxiv_url, headers={"Range": "bytes=0-4"}, allow_redirects=True
-            ) as response:
-                first_bytes = await response.content.read()
-                if first_bytes != b"%PDF-":
-                    self.logger.error("The file does not have a valid PDF signature.")
-                    return False
-
-            return True
-        except aiohttp.ClientError as e:
-            self.logger.error(f"Network error while validating PDF: {e}")
-            return False
-        except Exception as e:
-            self.logger.error(
-                f"An unexpected error occurred while validating the PDF URL: {e}"
-            )
-            return False
-
     async def fetch_arxiv_pdf_bytes(self) -> bytes | None:
         if self._pdf_bytes_cache is not None:
             return self._pdf_bytes_cache
 
-        if not await self.is_valid_pdf_url():
-            return None
+        try:
+            cached = await asyncio.to_thread(
+                pdf_cache.get, self.cache_key, latest_max_age(self.cache_key)
+            )
+        except Exception as e:
+            self.logger.warning(f"PDF cache lookup failed for {self.cache_key}: {e}")
+            cached = None
+
+        if cached is not None:
+            self.logger.info(f"PDF cache hit for {self.cache_key}")
+            self._pdf_bytes_cache = cached
+            return cached
 
         try:
-            session = await self._get_session()
-            async with session.get(self.arxiv_url, allow_redirects=True) as response:
-                pdf_bytes = await response.read()
+            pdf_bytes = await self._download_pdf()
+            if pdf_bytes is None:
+                return None
 
             doc = pymupdf.open(stream=pdf_bytes, filetype="pdf")
             self.logger.info(
                 f"Success: PDF verification passed. Number of pages: {len(doc)}"
             )
             self._pdf_bytes_cache = pdf_bytes
+
+            try:
+                await asyncio.to_thread(pdf_cache.set, self.cache_key, pdf_bytes)
+            except Exception as e:
+                self.logger.warning(f"Failed to cache PDF {self.cache_key}: {e}")
+
             return pdf_bytes
+        except PDFTooLargeError as e:
+            self.logger.error(str(e))
+            return None
         except aiohttp.ClientError as e:
             self.logger.error(f"Network error while fetching PDF: {e}")
             return None
@@ -87,21 +167,83 @@ class ArxivPDF:
                 f"An error occurred while fetching PDF Bytes from ArXiv: {e}"
             )
 
+    async def _download_pdf(self) -> bytes | None:
+        """
+        Download the PDF in a single streaming GET.
+
+        Status, Content-Type and the %PDF- signature are checked on the first
+        chunk, and the download is aborted once it exceeds PDF_MAX_BYTES.
+        """
+        session = await self._get_session()
+        async with session.get(self.arxiv_url, allow_redirects=True) as response:
+            if response.status != 200:
+                self.logger.error(f"URL returned status code {response.status}")
+                return None
+
+            content_type = response.headers.get("Content-Type", "").lower()
+            if "pdf" not in content_type:
+                self.logger.error("The file is not a PDF (Content-Type mismatch).")
+                return None
+
+            if response.content_length and response.content_length > PDF_MAX_BYTES:
+                raise PDFTooLargeError(
+                    f"PDF {self.arxiv_id} is {response.content_length} bytes, limit is {PDF_MAX_BYTES}"
+                )
+
+            buffer = bytearray()
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                if not buffer and len(chunk) >= 5 and not chunk.startswith(b"%PDF-"):
+                    self.logger.error("The file does not have a valid PDF signature.")
+                    return None
+
+                buffer.extend(chunk)
+                if len(buffer) > PDF_MAX_BYTES:
+                    raise PDFTooLargeError(
+                        f"PDF {self.arxiv_id} exceeded {PDF_MAX_BYTES} bytes while downloading"
+                    )
+
+        if not buffer.startswith(b"%PDF-"):
+            self.logger.error("The file does not have a valid PDF signature.")
+            return None
+
+        return bytes(buffer)
+
     async def fetch_arxiv_pdf_markdown(self) -> str | None:
         pdf_bytes = await self.fetch_arxiv_pdf_bytes()
         if not pdf_bytes:
             return None
 
-        temp_file_path = None
+        cache_key = markdown_cache_key(pdf_bytes)
         try:
-            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_file:
-                temp_file_path = temp_file.name
-                temp_file.write(pdf_bytes)
+            cached = await asyncio.to_thread(markdown_cache.get, cache_key)
+        except Exception as e:
+            self.logger.warning(
+                f"Markdown cache lookup failed for {self.arxiv_id}: {e}"
+            )
+            cached = None
+
+        if cached:
+            self.logger.info(f"Markdown cache hit for {self.arxiv_id}")
+            return cached
 
+        try:
             self.logger.info(f"Parsing PDF from {self.arxiv_url} with pymupdf4llm")
 
             try:
-                markdown_content = await asyncio.to_thread(to_markdown, temp_file_path)
+                page_count = await asyncio.to_thread(pdf_page_count, pdf_bytes)
+                ranges = page_ranges(page_count, PARSER_PAGES_PER_JOB)
+
+                if len(ranges) <= 1:
+                    markdown_content = await pdf_parser.to_markdown(pdf_bytes)
+                else:
+                    markdown_content = await self._parse_page_ranges(
+                        pdf_bytes, cache_key, ranges
+                    )
+            except ParserBusyError:
+                raise
+            except asyncio.TimeoutError:
+                self.logger.error(f"pymupdf4llm timed out parsing {self.arxiv_id}")
+                return None
             except Exception as e:
                 self.logger.error(f"Unexpected pymupdf4llm error: {e}")
                 return None
@@ -111,22 +253,63 @@ class ArxivPDF:
                 return None
 
             self.logger.info("PDF successfully converted to markdown.")
+
+            try:
+                await asyncio.to_thread(markdown_cache.set, cache_key, markdown_content)
+            except Exception as e:
+                self.logger.warning(
+                    f"Failed to cache markdown for {self.arxiv_id}: {e}"
+                )
+
             return markdown_content
+        except ParserBusyError:
+            raise
         except Exception as e:
             self.logger.error(f"Error converting PDF to markdown: {e}")
             return None
-        finally:
-            if temp_file_path and os.path.exists(temp_file_path):
+
+    async def _parse_page_ranges(
+        self, pdf_bytes: bytes, cache_key: str, ranges: list[tuple[int, int]]
+    ) -> str | None:
+        """
+        Convert page ranges concurrently in the parser pool and join them in
+        page order. Every finished range is cached on its own, so a retry
+        after a partial failure only re-parses the ranges that failed.
+        """
+        range_keys = [f"{cache_key}:pages-{start}-{stop}" for start, stop in ranges]
+        results = await asyncio.gather(
+            *(asyncio.to_thread(markdown_cache.get, key) for key in range_keys)
+        )
+        missing = [i for i, result in enumerate(results) if result is None]
+
+        if missing:
+            self.logger.info(
+                f"Parsing {self.arxiv_id} as {len(missing)} page ranges in parallel"
+            )
+            parsed = await pdf_parser.ranges_to_markdown(
+                pdf_bytes, [ranges[i] for i in missing]
+            )
+            for i, result in zip(missing, parsed):
+                results[i] = result
+                if isinstance(result, BaseException):
+                    start, stop = ranges[i]
+                    self.logger.error(
+                        f"Failed to parse pages {start}-{stop} of {self.arxiv_id}: {result!r}"
+                    )
+                    continue
                 try:
-                    os.unlink(temp_file_path)
+                    await asyncio.to_thread(markdown_cache.set, range_keys[i], result)
                 except Exception as e:
                     self.logger.warning(
-                        f"Failed to delete temporary file {temp_file_path}: {e}"
+                        f"Failed to cache pages of {self.arxiv_id}: {e}"
                     )
 
+        if any(isinstance(result, BaseException) for result in results):
+            return None
+        return "".join(results)
+
     async def __aenter__(self) -> "ArxivPDF":
         return self
 
     async def __aexit__(self, exc_type, exc, tb):
-        if self._session and not self._session.closed:
-            await self._session.close()
+        await self.close()
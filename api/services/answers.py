@@ -0,0 +1,169 @@
+from config import (
+    LOG_CONFIG,
+    RAG_CHAT_MODEL,
+    RAG_SYSTEM_PROMPT,
+    RAG_USER_PROMPT,
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_TTL,
+    SEMANTIC_CACHE_SIZE,
+    SEMANTIC_CACHE_THRESHOLD,
+)
+
+from services.cache import SingleFlight
+
+from cachetools import TTLCache
+from typing import Awaitable, Callable, List, Optional
+import numpy as np
+import hashlib
+import logging.config
+import re
+import threading
+import time
+
+logging.config.dictConfig(LOG_CONFIG)
+
+RAG_PROMPT_HASH = hashlib.sha256(
+    f"{RAG_SYSTEM_PROMPT}\0{RAG_USER_PROMPT}".encode("utf-8")
+).hexdigest()[:16]
+
+
+def normalize_query(query: str) -> str:
+    """Case, whitespace and trailing punctuation do not change the question"""
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.rstrip(" ?!.")
+
+
+class AnswerUnavailable(Exception):
+    """A user-facing fallback answer that must not be cached"""
+
+
+class AnswerCache:
+    """
+    TTL- and size-bounded cache of /query answers keyed by paper, normalized
+    question, top_k, chat model and prompt hash. Identical questions that
+    arrive while the first one is still being answered share its LLM call.
+    """
+
+    def __init__(self, maxsize: int = ANSWER_CACHE_SIZE, ttl: float = ANSWER_CACHE_TTL):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.flights = SingleFlight()
+        self.logger = logging.getLogger(__name__)
+        self.hits = 0
+        self.misses = 0
+        self.semantic_hits = 0
+        self.saved_seconds = 0.0
+
+    def key(self, arxiv_id: str, query: str, top_k: int) -> str:
+        return "\0".join(
+            [
+                arxiv_id.lower(),
+                normalize_query(query),
+                str(top_k),
+                RAG_CHAT_MODEL,
+                RAG_PROMPT_HASH,
+            ]
+        )
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            answer, seconds = entry
+            self.hits += 1
+            self.saved_seconds += seconds
+            return answer
+
+    def record_semantic_hit(self):
+        with self._lock:
+            self.semantic_hits += 1
+
+    def set(self, key: str, answer: str, seconds: float):
+        with self._lock:
+            self._cache[key] = (answer, seconds)
+
+    async def get_or_compute(
+        self,
+        arxiv_id: str,
+        query: str,
+        top_k: int,
+        compute: Callable[[], Awaitable[str]],
+    ) -> str:
+        key = self.key(arxiv_id, query, top_k)
+        answer = self.get(key)
+        if answer is not None:
+            self.logger.info(f"Answer cache hit for {arxiv_id}")
+            return answer
+
+        async def _compute_and_store() -> str:
+            start = time.time()
+            answer = await compute()
+            self.set(key, answer, time.time() - start)
+            return answer
+
+        with self._lock:
+            self.misses += 1
+        return await self.flights.do(key, _compute_and_store)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "semantic_hits": self.semantic_hits,
+                "coalesced": self.flights.coalesced,
+                "saved_seconds": round(self.saved_seconds, 2),
+            }
+
+
+class SemanticAnswerIndex:
+    """
+    Small per-paper index of past question embeddings and their answers.
+    A new question whose embedding is within `threshold` cosine similarity
+    of a past one (asked with the same top_k) reuses that answer. The
+    oldest entries are dropped once `maxsize` is reached.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = SEMANTIC_CACHE_SIZE,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+    ):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self._vectors: Optional[np.ndarray] = None
+        self._answers: List[tuple[int, str]] = []
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(self, vector, top_k: int) -> Optional[str]:
+        if self._vectors is None or not self._answers:
+            return None
+
+        scores = self._vectors @ self._normalize(vector)
+        for i in np.argsort(-scores):
+            if scores[i] < self.threshold:
+                return None
+            stored_top_k, answer = self._answers[i]
+            if stored_top_k == top_k:
+                return answer
+        return None
+
+    def add(self, vector, top_k: int, answer: str):
+        row = self._normalize(vector)[np.newaxis, :]
+        if self._vectors is None:
+            self._vectors = row
+        else:
+            self._vectors = np.vstack([self._vectors, row])[-self.maxsize :]
+        self._answers = (self._answers + [(top_k, answer)])[-self.maxsize :]
+
+
+answer_cache = AnswerCache()
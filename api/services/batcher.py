@@ -0,0 +1,118 @@
+from config import (
+    LOG_CONFIG,
+    EMBED_BATCH_SIZE,
+    EMBED_BATCH_WAIT_MS,
+    EMBED_MAX_CONCURRENT_BATCHES,
+)
+
+from typing import Callable, List, Sequence
+import asyncio
+import logging.config
+
+logging.config.dictConfig(LOG_CONFIG)
+
+
+class EmbeddingBatcher:
+    """
+    Process-wide micro-batcher for single-text embeddings.
+
+    Callers queue texts and await their own future. The queue is flushed as
+    one `encode` call once it holds `max_batch` texts or the oldest text has
+    waited `max_wait` seconds, and at most `max_concurrent` batches run in
+    the executor at a time. A text that arrives while no batch is in flight
+    and nothing else is queued is encoded at once, so the wait only applies
+    under load.
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], Sequence],
+        max_batch: int = EMBED_BATCH_SIZE,
+        max_wait: float = EMBED_BATCH_WAIT_MS / 1000,
+        max_concurrent: int = EMBED_MAX_CONCURRENT_BATCHES,
+    ):
+        self.encode = encode
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.logger = logging.getLogger(__name__)
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._in_flight = 0
+        self.batches = 0
+        self.texts = 0
+
+    async def embed(self, text: str):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        idle = len(self._pending) == 1 and not self._in_flight
+        if idle or len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        self._in_flight += 1
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[str, asyncio.Future]]):
+        try:
+            await self._encode_batch(batch)
+        finally:
+            # Before the callers resume, so the next lone text is not held back
+            self._in_flight -= 1
+
+    async def _encode_batch(self, batch: list[tuple[str, asyncio.Future]]):
+        # Callers that already gave up (timeout/cancel) are not embedded
+        batch = [(text, future) for text, future in batch if not future.done()]
+        if not batch:
+            return
+
+        texts = list(dict.fromkeys(text for text, _ in batch))
+
+        try:
+            async with self._semaphore:
+                loop = asyncio.get_running_loop()
+                embeddings = await loop.run_in_executor(None, self.encode, texts)
+
+            if embeddings is None or len(embeddings) != len(texts):
+                raise RuntimeError("Embedding batch returned incomplete results")
+        except Exception as e:
+            self.logger.error(f"Embedding batch of {len(texts)} texts failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.texts += len(texts)
+
+        by_text = dict(zip(texts, embeddings))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch_size": (
+                round(self.texts / self.batches, 2) if self.batches else 0
+            ),
+            "queued": len(self._pending),
+        }
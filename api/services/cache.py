@@ -0,0 +1,420 @@
+from config import LOG_CONFIG
+
+from cachetools import LRUCache
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+import asyncio
+import fcntl
+import hashlib
+import logging.config
+import os
+import tempfile
+import threading
+import time
+import zlib
+
+logging.config.dictConfig(LOG_CONFIG)
+
+
+class DiskCache:
+    """
+    Size-bounded, LRU-evicting key/value store of bytes on local disk.
+
+    Entries are written to a temporary file and moved into place with
+    os.replace, so readers (including other worker processes sharing the
+    directory) never see a partially written entry.
+
+    The byte budget applies to the directory, not to this process: every
+    write takes an exclusive lock on the directory, re-reads what is
+    actually on disk and evicts the least recently used entries until the
+    total fits, so workers sharing `directory` share one budget. Access
+    time tracks recency and modification time records when an entry was
+    written, which is what `max_age` is checked against.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, suffix: str = ".bin"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._lock_path = os.path.join(directory, ".lock")
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            self._scan()
+        self.logger.info(
+            f"Disk cache at {self.directory}: {len(self._entries)} entries, {self._total_bytes} bytes"
+        )
+
+    @contextmanager
+    def _directory_lock(self):
+        """Exclusive lock shared by every process using this directory"""
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _scan(self):
+        """Rebuild the LRU order from what is on disk (least recently used first)"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_atime, name, stat.st_size))
+
+        self._entries = OrderedDict((name, size) for _, name, size in sorted(entries))
+        self._total_bytes = sum(self._entries.values())
+
+    def _filename(self, key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest() + self.suffix
+
+    def _forget(self, name: str):
+        size = self._entries.pop(name, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[bytes]:
+        """Return the entry, or None if it is missing or older than `max_age` seconds"""
+        entry = self.read(key, max_age)
+        return entry[0] if entry is not None else None
+
+    def read(
+        self, key: str, max_age: Optional[float] = None
+    ) -> Optional[tuple[bytes, float]]:
+        """Like get, but also return the wall-clock time the entry was written"""
+        name = self._filename(key)
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, "rb") as f:
+                written_at = os.fstat(f.fileno()).st_mtime
+                data = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+                self._forget(name)
+            return None
+        except OSError as e:
+            self.logger.warning(f"Failed to read cache entry {name}: {e}")
+            with self._lock:
+                self.misses += 1
+            return None
+
+        if max_age is not None and time.time() - written_at > max_age:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            with self._lock:
+                self.misses += 1
+                self.expired += 1
+                self._forget(name)
+            return None
+
+        try:
+            os.utime(path, (time.time(), written_at))
+        except OSError:
+            pass
+
+        with self._lock:
+            self.hits += 1
+            if name not in self._entries:
+                # Written by another worker sharing the directory
+                self._entries[name] = len(data)
+                self._total_bytes += len(data)
+            self._entries.move_to_end(name)
+        return data, written_at
+
+    def set(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            self.logger.warning(
+                f"Not caching {key}: {len(data)} bytes exceeds the cache budget"
+            )
+            return
+
+        name = self._filename(key)
+        path = os.path.join(self.directory, name)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        with self._lock, self._directory_lock():
+            self._scan()
+            # Evict others first: the entry just written is the most recent
+            if name in self._entries:
+                self._entries.move_to_end(name)
+            self._evict()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.unlink(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.logger.warning(f"Failed to evict cache entry {name}: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "evictions": self.evictions,
+            }
+
+
+class TextCache:
+    """
+    Two-tier cache of text: a byte-bounded in-memory LRU in front of a
+    zlib-compressed DiskCache.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, memory_max_bytes: int):
+        self.disk = DiskCache(directory, max_bytes, suffix=".z")
+        self.memory = LRUCache(
+            maxsize=memory_max_bytes, getsizeof=lambda entry: len(entry[0])
+        )
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[str]:
+        with self._lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                text, written_at = entry
+                if max_age is None or time.time() - written_at <= max_age:
+                    self.memory_hits += 1
+                    return text
+                del self.memory[key]
+
+        entry = self.disk.read(key, max_age)
+        if entry is None:
+            return None
+
+        data, written_at = entry
+        text = zlib.decompress(data).decode("utf-8")
+        self._remember(key, text, written_at)
+        return text
+
+    def set(self, key: str, text: str):
+        self.disk.set(key, zlib.compress(text.encode("utf-8"), 6))
+        self._remember(key, text, time.time())
+
+    def _remember(self, key: str, text: str, written_at: float):
+        if len(text) > self.memory.maxsize:
+            return
+        with self._lock:
+            self.memory[key] = (text, written_at)
+
+    def stats(self) -> dict:
+        stats = self.disk.stats()
+        with self._lock:
+            stats["memory_hits"] = self.memory_hits
+            stats["memory_entries"] = len(self.memory)
+            stats["memory_bytes"] = self.memory.currsize
+        return stats
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one in-flight task.
+
+    The shared work runs as its own task, so a caller that is cancelled or
+    times out does not cancel the work for everyone else waiting on it.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Task] = {}
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every waiter went away
+            task.exception()
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+
+class _BroadcastStream:
+    def __init__(self):
+        self.items: list = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.changed = asyncio.Event()
+
+    def notify(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class Broadcast:
+    """
+    Shares one in-flight async producer per key between streaming consumers.
+
+    Every consumer first replays the items produced so far, then follows
+    new ones as they arrive. The producer runs as its own task, so a
+    consumer that disconnects does not stop it for everyone else.
+    """
+
+    def __init__(self):
+        self._streams: dict[str, _BroadcastStream] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self.coalesced = 0
+
+    async def subscribe(
+        self, key: str, produce: Callable[[], AsyncIterator[Any]]
+    ) -> AsyncIterator[Any]:
+        stream = self._streams.get(key)
+        if stream is None:
+            stream = _BroadcastStream()
+            self._streams[key] = stream
+            task = asyncio.ensure_future(self._run(key, stream, produce))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            self.coalesced += 1
+
+        index = 0
+        while True:
+            if index < len(stream.items):
+                index += 1
+                yield stream.items[index - 1]
+            elif stream.done:
+                if stream.error is not None:
+                    raise stream.error
+                return
+            else:
+                await stream.changed.wait()
+
+    async def _run(
+        self,
+        key: str,
+        stream: _BroadcastStream,
+        produce: Callable[[], AsyncIterator[Any]],
+    ):
+        try:
+            async for item in produce():
+                stream.items.append(item)
+                stream.notify()
+        except Exception as e:
+            stream.error = e
+        finally:
+            stream.done = True
+            stream.notify()
+            if self._streams.get(key) is stream:
+                del self._streams[key]
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+
+class ResponseCache:
+    """
+    LRU- and TTL-bounded in-memory cache of upstream responses with
+    stale-while-revalidate.
+
+    Entries younger than `ttl` are served as-is. Entries younger than
+    `ttl + stale_ttl` are served immediately while one background load
+    refreshes them. Identical loads in flight share a single call.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, stale_ttl: float):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.logger = logging.getLogger(__name__)
+        self._cache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._refreshes: set[asyncio.Task] = set()
+        self.flights = SingleFlight()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    async def _load(self, key: str, load: Callable[[], Awaitable[Any]]) -> Any:
+        value = await load()
+        with self._lock:
+            self._cache[key] = (value, time.monotonic())
+        return value
+
+    def _revalidate(self, key: str, load: Callable[[], Awaitable[Any]]):
+        task = asyncio.ensure_future(
+            self.flights.do(key, lambda: self._load(key, load))
+        )
+        self._refreshes.add(task)
+        task.add_done_callback(self._finish_refresh)
+
+    def _finish_refresh(self, task: asyncio.Task):
+        self._refreshes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.warning(f"Background refresh failed: {task.exception()}")
+
+    async def get_or_load(self, key: str, load: Callable[[], Awaitable[Any]]) -> Any:
+        with self._lock:
+            entry = self._cache.get(key)
+            age = time.monotonic() - entry[1] if entry is not None else None
+            if age is not None and age < self.ttl:
+                self.hits += 1
+                return entry[0]
+            stale = age is not None and age < self.ttl + self.stale_ttl
+            if stale:
+                self.stale_hits += 1
+            else:
+                self.misses += 1
+
+        if stale:
+            self._revalidate(key, load)
+            return entry[0]
+        return await self.flights.do(key, lambda: self._load(key, load))
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            served = self.hits + self.stale_hits
+            return {
+                "entries": len(self._cache),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_rate": round(served / lookups, 4) if lookups else 0.0,
+                "coalesced": self.flights.coalesced,
+            }
@@ -0,0 +1,166 @@
+from config import (
+    LOG_CONFIG,
+    EMB_MODEL,
+    CACHE_SIZE,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    VECTOR_QUANTIZATION,
+)
+
+from services.quantize import to_bytes, from_bytes
+
+from cachetools import LRUCache
+from typing import List, Optional, Sequence
+import numpy as np
+import hashlib
+import logging.config
+import os
+import sqlite3
+import threading
+
+logging.config.dictConfig(LOG_CONFIG)
+
+
+class EmbeddingCache:
+    """
+    Embedding cache keyed by hash(text, embedding model).
+
+    A small in-memory LRU sits in front of a SQLite database in WAL mode,
+    so every uvicorn worker (and every restart on the same disk) reads the
+    same entries concurrently. Both tiers hold vectors quantized per
+    VECTOR_QUANTIZATION (float16 by default) and return float32. The
+    database keeps at most `max_entries` rows, dropping the oldest first.
+    """
+
+    def __init__(
+        self,
+        path: str = EMBEDDING_CACHE_PATH,
+        max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+        memory_size: int = CACHE_SIZE,
+        model: str = EMB_MODEL,
+        quantization: str = VECTOR_QUANTIZATION,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.model = model
+        self.quantization = quantization
+        self.logger = logging.getLogger(__name__)
+        self.memory = LRUCache(maxsize=memory_size)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes_since_prune = 0
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key BLOB PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _key(self, text: str) -> bytes:
+        key = f"{self.model}\0{self.quantization}\0{text}"
+        return hashlib.sha256(key.encode("utf-8")).digest()
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        return self.get_many([text])[0]
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        results: List[Optional[np.ndarray]] = []
+        missing = {}
+        with self._lock:
+            for i, text in enumerate(texts):
+                blob = self.memory.get(text)
+                results.append(
+                    from_bytes(blob, self.quantization) if blob is not None else None
+                )
+                if blob is None:
+                    missing.setdefault(self._key(text), []).append(i)
+
+        if missing:
+            try:
+                keys = list(missing)
+                rows = []
+                # Stay well below SQLite's bound-parameter limit
+                for start in range(0, len(keys), 500):
+                    batch = keys[start : start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    rows.extend(
+                        self._connection().execute(
+                            f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                            batch,
+                        )
+                    )
+            except sqlite3.Error as e:
+                self.logger.warning(f"Embedding cache read failed: {e}")
+                rows = []
+
+            with self._lock:
+                for key, blob in rows:
+                    embedding = from_bytes(blob, self.quantization)
+                    for i in missing[key]:
+                        results[i] = embedding
+                        self.memory[texts[i]] = blob
+
+        with self._lock:
+            found = sum(1 for embedding in results if embedding is not None)
+            self.hits += found
+            self.misses += len(results) - found
+        return results
+
+    def set(self, text: str, embedding):
+        self.set_many([text], [embedding])
+
+    def set_many(self, texts: Sequence[str], embeddings: Sequence):
+        rows = []
+        with self._lock:
+            for text, embedding in zip(texts, embeddings):
+                blob = to_bytes(embedding, self.quantization)
+                self.memory[text] = blob
+                rows.append((self._key(text), blob))
+
+        try:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    rows,
+                )
+            self._writes_since_prune += len(rows)
+            if self._writes_since_prune >= 1000:
+                self._writes_since_prune = 0
+                self._prune(conn)
+        except sqlite3.Error as e:
+            self.logger.warning(f"Embedding cache write failed: {e}")
+
+    def _prune(self, conn: sqlite3.Connection):
+        (count,) = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            with conn:
+                conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY rowid LIMIT ?)",
+                    (excess,),
+                )
+            self.logger.info(f"Pruned {excess} entries from the embedding cache")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "memory_entries": len(self.memory),
+                "hits": self.hits,
+                "misses": self.misses,
+                "max_entries": self.max_entries,
+                "quantization": self.quantization,
+            }
@@ -9,6 +9,11 @@ from config import (
     AWS_SECRET_ACCESS_KEY,
     GEM_MODEL,
     CITATIONS_PROMPT,
+    GEMINI_UPLOAD_PDFS,
+    GEMINI_FILE_TTL,
+    GEMINI_FILE_CACHE_SIZE,
+    SUMMARY_MODE,
+    COMBINED_PROMPT,
 )
 
 from models import (
@@ -20,30 +25,44 @@ from models import (
     Citations,
 )
 
+from services.cache import SingleFlight
+
 from google import genai
-from google.genai import types
+from google.genai import errors, types
+from cachetools import TTLCache
+from typing import AsyncIterator, Optional, Tuple
 import logging.config
+import hashlib
 import json
+import io
 import asyncio
 import boto3
 
 logging.config.dictConfig(LOG_CONFIG)
 
+# Files uploaded to the Gemini Files API, keyed by PDF content hash. Gemini
+# keeps uploads for 48 hours, so entries expire a little before that.
+_uploaded_pdfs: TTLCache = TTLCache(maxsize=GEMINI_FILE_CACHE_SIZE, ttl=GEMINI_FILE_TTL)
+_pdf_uploads = SingleFlight()
+
+summary_mode_stats = {"combined_ok": 0, "combined_fallbacks": 0}
+
 
 class Extractor:
     def __init__(
         self,
         pdf_bytes: bytes,
         model_name: str = GEM_MODEL,
+        mode: str = SUMMARY_MODE,
     ):
         self.bytes = pdf_bytes
         self.model_name = model_name
+        self.mode = mode
         self.client = genai.Client(api_key=GEM_KEY)
         self.logger = logging.getLogger(__name__)
         self._polly_client = None
-        self._pdf_part = types.Part.from_bytes(
-            data=self.bytes, mime_type="application/pdf"
-        )
+        self._pdf_hash = hashlib.sha256(self.bytes).hexdigest()
+        self._pdf_part = None
         self.voice = boto3.client(
             "polly",
             aws_access_key_id=AWS_ACCESS_KEY_ID,
@@ -62,16 +81,92 @@ class Extractor:
             )
         return self._polly_client
 
-    async def _generate_content(self, prompt, response_schema):
+    async def _upload_pdf(self) -> types.Part:
+        uploaded = await self.client.aio.files.upload(
+            file=io.BytesIO(self.bytes),
+            config=types.UploadFileConfig(
+                mime_type="application/pdf", display_name=self._pdf_hash
+            ),
+        )
+
+        for _ in range(30):
+            if uploaded.state != types.FileState.PROCESSING:
+                break
+            await asyncio.sleep(1)
+            uploaded = await self.client.aio.files.get(name=uploaded.name)
+
+        if uploaded.state != types.FileState.ACTIVE:
+            raise RuntimeError(f"Uploaded file {uploaded.name} is {uploaded.state}")
+
+        self.logger.info(f"Uploaded PDF {self._pdf_hash[:12]} as {uploaded.name}")
+        part = types.Part.from_uri(file_uri=uploaded.uri, mime_type=uploaded.mime_type)
+        _uploaded_pdfs[self._pdf_hash] = part
+        return part
+
+    async def _get_pdf_part(self) -> types.Part:
+        """
+        Reference the PDF through a single Files API upload shared by every
+        prompt and request for the same paper, falling back to sending the
+        bytes inline if the upload fails.
+        """
+        if self._pdf_part is not None:
+            return self._pdf_part
+
+        if GEMINI_UPLOAD_PDFS:
+            part = _uploaded_pdfs.get(self._pdf_hash)
+            if part is None:
+                try:
+                    part = await _pdf_uploads.do(self._pdf_hash, self._upload_pdf)
+                except Exception as e:
+                    self.logger.warning(f"PDF upload failed, sending inline: {e}")
+            if part is not None:
+                self._pdf_part = part
+                return part
+
+        return self._use_inline_part()
+
+    def _use_inline_part(self) -> types.Part:
+        self._pdf_part = types.Part.from_bytes(
+            data=self.bytes, mime_type="application/pdf"
+        )
+        return self._pdf_part
+
+    async def _generate(self, prompt: str, response_schema):
+        """
+        Run one generate_content call against the PDF. If Gemini rejects an
+        uploaded file as missing or inaccessible (403/404), which happens
+        when it drops the file before our TTL runs out, the handle is
+        evicted so the next request re-uploads, and the call is retried
+        once with the PDF inline. Other errors are raised unchanged.
+        """
+        pdf_part = await self._get_pdf_part()
         try:
-            response = await self.client.aio.models.generate_content(
-                model=self.model_name,
-                contents=[self._pdf_part, prompt],
-                config={
-                    "response_mime_type": "application/json",
-                    "response_schema": response_schema,
-                },
+            return await self._generate_with(pdf_part, prompt, response_schema)
+        except errors.ClientError as e:
+            if pdf_part.file_data is None or e.code not in (403, 404):
+                raise
+            self.logger.warning(
+                f"Generation with uploaded PDF {self._pdf_hash[:12]} failed, retrying inline: {e}"
             )
+            if _uploaded_pdfs.get(self._pdf_hash) is pdf_part:
+                _uploaded_pdfs.pop(self._pdf_hash, None)
+            if self._pdf_part is pdf_part:
+                self._use_inline_part()
+            return await self._generate_with(self._pdf_part, prompt, response_schema)
+
+    async def _generate_with(self, pdf_part: types.Part, prompt: str, response_schema):
+        return await self.client.aio.models.generate_content(
+            model=self.model_name,
+            contents=[pdf_part, prompt],
+            config={
+                "response_mime_type": "application/json",
+                "response_schema": response_schema,
+            },
+        )
+
+    async def _generate_content(self, prompt, response_schema):
+        try:
+            response = await self._generate(prompt, response_schema)
             return response.text
 
         except Exception as e:
@@ -111,7 +206,36 @@ class Extractor:
         except Exception as e:
             self.logger.error(f"Error generating citations: {str(e)}")
 
+    async def combined_summaries(self) -> Optional[EndResponse]:
+        """
+        Generate all four sections in one call against the EndResponse schema.
+        Returns None if the call fails or the output was truncated.
+        """
+        try:
+            response = await self._generate(COMBINED_PROMPT, EndResponse)
+
+            candidate = response.candidates[0] if response.candidates else None
+            if candidate and candidate.finish_reason == types.FinishReason.MAX_TOKENS:
+                self.logger.warning("Combined summary was truncated by the model.")
+                return None
+
+            summaries = EndResponse.model_validate_json(response.text)
+            self.logger.info("Combined summaries received.")
+            return summaries
+        except Exception as e:
+            self.logger.error(f"Error generating combined summaries: {e}")
+            return None
+
     async def get_all_summaries(self) -> EndResponse:
+        if self.mode == "combined":
+            summaries = await self.combined_summaries()
+            if summaries is not None:
+                summary_mode_stats["combined_ok"] += 1
+                return summaries
+
+            summary_mode_stats["combined_fallbacks"] += 1
+            self.logger.warning("Falling back to per-section summary calls.")
+
         try:
             tasks = [
                 self.overall_explanation(),
@@ -142,6 +266,47 @@ class Extractor:
         except Exception as e:
             self.logger.error(f"Error in combining summaries: {e}")
 
+    async def iter_summaries(
+        self,
+    ) -> AsyncIterator[Tuple[str, Optional[dict], Optional[str]]]:
+        """
+        Yield (section, data, error) for each EndResponse section as soon as
+        its Gemini call finishes, fastest first. A failed section yields an
+        error message instead of data and does not stop the others.
+        """
+        sections = {
+            "overall_summary": (self.overall_explanation, OverallSummary),
+            "terms_and_summaries": (self.sectionwise_explanations, TermsAndSummaries),
+            "table_and_figure_summaries": (self.figure_summaries, FigureSummaries),
+            "citations": (self.generate_citations, Citations),
+        }
+
+        async def run(section: str):
+            generate, _ = sections[section]
+            return section, await generate()
+
+        tasks = [asyncio.create_task(run(section)) for section in sections]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                section, response_text = await next_done
+                if response_text is None:
+                    yield section, None, "Generation failed"
+                    continue
+
+                try:
+                    _, schema = sections[section]
+                    data = schema.model_validate_json(response_text).model_dump()
+                except Exception as e:
+                    self.logger.error(f"Invalid {section} response: {e}")
+                    yield section, None, "Model returned an invalid response"
+                    continue
+
+                yield section, data, None
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
     async def generate_voice_summary(self):
         try:
             response_text = await self._generate_content(VOICE_PROMPT, InVoiceSummary)
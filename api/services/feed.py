@@ -1,36 +1,159 @@
+import asyncio
 import logging.config
 import random
-from typing import List, Optional
+import re
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
 
 import httpx
-from config import LOG_CONFIG, SEARCH_API
+from config import (
+    LOG_CONFIG,
+    SEARCH_API,
+    FEED_HTTP2,
+    FEED_MAX_CONNECTIONS,
+    FEED_MAX_KEEPALIVE,
+    FEED_KEEPALIVE_EXPIRY,
+    FEED_CONNECT_TIMEOUT,
+    FEED_TIMEOUT,
+    FEED_LEG_TIMEOUT,
+    FEED_HEDGE_PERCENTILE,
+    FEED_HEDGE_MIN_DELAY,
+    FEED_LATENCY_WINDOW,
+    RESPONSE_CACHE_SIZE,
+    SEARCH_CACHE_TTL,
+    SIMILAR_CACHE_TTL,
+    RESPONSE_CACHE_STALE_TTL,
+)
 from models import ArxivDomains, SearchResult
+from services.feedpool import feed_pool
+from services.cache import ResponseCache
 
 logging.config.dictConfig(LOG_CONFIG)
 
 
+def _create_client(base_url: str) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=base_url,
+        http2=FEED_HTTP2,
+        limits=httpx.Limits(
+            max_connections=FEED_MAX_CONNECTIONS,
+            max_keepalive_connections=FEED_MAX_KEEPALIVE,
+            keepalive_expiry=FEED_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(FEED_TIMEOUT, connect=FEED_CONNECT_TIMEOUT),
+    )
+
+
+class LatencyTracker:
+    """Rolling window of search latencies used to decide when to hedge"""
+
+    def __init__(self, window: int = FEED_LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def hedge_delay(self) -> Optional[float]:
+        """FEED_HEDGE_PERCENTILE of recent latencies, or None until there are enough samples"""
+        if len(self.samples) < 20:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * FEED_HEDGE_PERCENTILE / 100))
+        return max(FEED_HEDGE_MIN_DELAY, ordered[index])
+
+    def stats(self) -> dict:
+        return {
+            "samples": len(self.samples),
+            "hedge_delay": self.hedge_delay(),
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+search_latency = LatencyTracker()
+search_cache = ResponseCache(
+    RESPONSE_CACHE_SIZE, SEARCH_CACHE_TTL, RESPONSE_CACHE_STALE_TTL
+)
+similar_cache = ResponseCache(
+    RESPONSE_CACHE_SIZE, SIMILAR_CACHE_TTL, RESPONSE_CACHE_STALE_TTL
+)
+
+
+def _normalize_text(text: Optional[str]) -> str:
+    return re.sub(r"\s+", " ", text.strip().lower()) if text else ""
+
+
+def search_cache_key(
+    query: Optional[str],
+    categories: Optional[List[str]],
+    categories_match_all: bool,
+    date_from: Optional[str],
+    date_to: Optional[str],
+    limit: int,
+) -> str:
+    return "\0".join(
+        [
+            _normalize_text(query),
+            ",".join(sorted(set(categories or []))),
+            str(categories_match_all),
+            date_from or "",
+            date_to or "",
+            str(limit),
+        ]
+    )
+
+
+def similar_cache_key(title: str, top_k: int) -> str:
+    return f"{_normalize_text(title)}\0{top_k}"
+
+
 class Feed:
+    _shared_client: Optional[httpx.AsyncClient] = None
+
     def __init__(self, base_url: str = SEARCH_API):
         self.base_url = base_url
         self.client = None
+        self._owns_client = False
         self.logger = logging.getLogger(__name__)
         self.all_domains = [domain.value for domain in ArxivDomains]
 
+    @classmethod
+    async def open_shared_client(cls, base_url: str = SEARCH_API):
+        """Create the pooled keep-alive client borrowed by every Feed in this process"""
+        if cls._shared_client is None or cls._shared_client.is_closed:
+            cls._shared_client = _create_client(base_url)
+        return cls._shared_client
+
+    @classmethod
+    async def close_shared_client(cls):
+        if cls._shared_client is not None and not cls._shared_client.is_closed:
+            await cls._shared_client.aclose()
+        cls._shared_client = None
+
     async def __aenter__(self):
-        self.client = httpx.AsyncClient(base_url=self.base_url)
-        self.logger.debug("Initialized HTTP client.")
+        shared = Feed._shared_client
+        if shared is not None and not shared.is_closed and self.base_url == SEARCH_API:
+            self.client = shared
+        else:
+            self.client = _create_client(self.base_url)
+            self._owns_client = True
+            self.logger.debug("Initialized HTTP client.")
         return self
 
     async def __aexit__(self, exc_type, exc, tb):
-        await self.client.aclose()
-        self.logger.debug("Closed HTTP client.")
+        await self.close()
 
     async def get_mixed_feed(
         self, user_interests: List[str], total_items: int = 20
     ) -> List[SearchResult]:
         """
         Creates a mixed feed with 70% from user interests and 30% exploration.
-        Uses maximum two requests to the microservice.
+        Legs are sampled from the in-memory feed pool once it is warm;
+        otherwise both are requested concurrently (each possibly hedged once).
+        If one leg fails or times out, the feed is padded from the other.
 
         Args:
             user_interests: List of user's ArXiv domain interests
@@ -65,22 +188,17 @@ class Feed:
         interest_count = int(total_items * 0.7)
         exploration_count = total_items - interest_count
 
-        results = []
-
+        # Each leg over-fetches up to the full count so it can pad for the other
+        legs = {}
         if interest_count > 0:
             selected_interests = random.sample(
                 valid_interests,
                 k=min(len(valid_interests), random.randint(2, len(valid_interests))),
             )
-            interest_results = await self._search_by_categories(
-                categories=[ArxivDomains(interest) for interest in selected_interests],
-                categories_match_all=False,
-                limit=interest_count,
-            )
-            results.extend(interest_results)
-            self.logger.info(
-                f"Retrieved {len(interest_results)} papers from user interests"
-            )
+            interest_categories = [
+                ArxivDomains(interest) for interest in selected_interests
+            ]
+            legs["interest"] = self._leg(interest_categories, limit=total_items)
         if exploration_count > 0:
             exploration_domains = [
                 d for d in self.all_domains if d not in valid_interests
@@ -95,19 +213,148 @@ class Feed:
                     random.randint(1, min(3, len(exploration_domains))),
                 ),
             )
+            exploration_categories = [
+                ArxivDomains(domain) for domain in selected_exploration
+            ]
+            legs["exploration"] = self._leg(exploration_categories, limit=total_items)
+
+        leg_results = await self._gather_legs(legs)
+        interest_results = leg_results.get("interest", [])
+        exploration_results = leg_results.get("exploration", [])
+        self.logger.info(
+            f"Retrieved {len(interest_results)} papers from user interests "
+            f"and {len(exploration_results)} papers for exploration"
+        )
+
+        results = self._compose(
+            [
+                (interest_results, interest_count),
+                (exploration_results, exploration_count),
+            ],
+            total_items,
+        )
+        random.shuffle(results)
 
-            exploration_results = await self._search_by_categories(
-                categories=[ArxivDomains(domain) for domain in selected_exploration],
+        return results
+
+    async def _leg(
+        self, categories: List[ArxivDomains], limit: int
+    ) -> List[SearchResult]:
+        """Serve a feed leg from the local feed pool when it is warm, else upstream"""
+        pooled = feed_pool.sample([c.value for c in categories], limit)
+        if pooled is not None:
+            return pooled
+
+        return await self._hedged(
+            lambda: self._search_by_categories(
+                categories=categories,
                 categories_match_all=False,
-                limit=exploration_count,
+                limit=limit,
             )
-            results.extend(exploration_results)
-            self.logger.info(
-                f"Retrieved {len(exploration_results)} papers for exploration"
+        )
+
+    @classmethod
+    async def fetch_domain(cls, domain: str, limit: int) -> List[SearchResult]:
+        """Fetch papers for one domain straight from the search service (feed pool refresh)"""
+        async with cls() as feed:
+            return await feed._search_by_categories(
+                categories=[ArxivDomains(domain)],
+                categories_match_all=False,
+                limit=limit,
             )
-        random.shuffle(results)
 
-        return results[:total_items]
+    async def _hedged(
+        self, call: Callable[[], Awaitable[List[SearchResult]]]
+    ) -> List[SearchResult]:
+        """
+        Run `call`, and if it is still pending after the hedge delay send one
+        duplicate. The first successful response wins; the other is cancelled.
+        """
+        start = time.monotonic()
+        tasks = [asyncio.ensure_future(call())]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=search_latency.hedge_delay())
+            if not done:
+                self.logger.debug("Search is slow, sending a hedged request")
+                search_latency.hedges += 1
+                tasks.append(asyncio.ensure_future(call()))
+
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        search_latency.record(time.monotonic() - start)
+                        if task is not tasks[0]:
+                            search_latency.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _gather_legs(
+        self, legs: Dict[str, Awaitable[List[SearchResult]]]
+    ) -> Dict[str, List[SearchResult]]:
+        """
+        Run feed legs concurrently. A leg that fails or misses
+        FEED_LEG_TIMEOUT is dropped; only if every leg is lost is an error raised.
+        """
+        tasks = {name: asyncio.ensure_future(leg) for name, leg in legs.items()}
+        if not tasks:
+            return {}
+
+        try:
+            _, pending = await asyncio.wait(tasks.values(), timeout=FEED_LEG_TIMEOUT)
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+        results, error = {}, None
+        for name, task in tasks.items():
+            if task in pending:
+                self.logger.warning(
+                    f"Feed {name} leg timed out after {FEED_LEG_TIMEOUT}s"
+                )
+            elif task.exception() is not None:
+                error = task.exception()
+                self.logger.warning(f"Feed {name} leg failed: {error}")
+            else:
+                results[name] = task.result()
+
+        if not results:
+            raise error or asyncio.TimeoutError("All feed legs timed out")
+        return results
+
+    @staticmethod
+    def _compose(legs: List[tuple], total_items: int) -> List[SearchResult]:
+        """
+        Take each leg's share of the feed, then pad up to `total_items` from
+        the leftovers of all legs. Papers appear at most once.
+        """
+        seen, picked, leftovers = set(), [], []
+        for results, count in legs:
+            taken = 0
+            for result in results:
+                if result.metadata.paper_id in seen:
+                    continue
+                if taken < count:
+                    seen.add(result.metadata.paper_id)
+                    picked.append(result)
+                    taken += 1
+                else:
+                    leftovers.append(result)
+
+        for result in leftovers:
+            if len(picked) >= total_items:
+                break
+            if result.metadata.paper_id not in seen:
+                seen.add(result.metadata.paper_id)
+                picked.append(result)
+        return picked
 
     async def similar_to_title(self, title: str, top_k: int = 5) -> List[SearchResult]:
         """
@@ -219,8 +466,11 @@ class Feed:
             raise
 
     async def close(self):
-        await self.client.aclose()
-        self.logger.debug("HTTP client closed.")
+        if self._owns_client and self.client is not None:
+            await self.client.aclose()
+            self.logger.debug("HTTP client closed.")
+        self.client = None
+        self._owns_client = False
 
     async def _search_by_categories(
         self, categories: List[ArxivDomains], categories_match_all: bool, limit: int
@@ -0,0 +1,144 @@
+from config import (
+    LOG_CONFIG,
+    FEED_POOL_ENABLED,
+    FEED_POOL_SIZE,
+    FEED_POOL_REFRESH_INTERVAL,
+    FEED_POOL_CONCURRENCY,
+    FEED_POOL_STARTUP_TIMEOUT,
+)
+
+from models import ArxivDomains, SearchResult
+
+from typing import Awaitable, Callable, Dict, List, Optional
+import asyncio
+import logging.config
+import random
+import time
+
+logging.config.dictConfig(LOG_CONFIG)
+
+
+class FeedPool:
+    """
+    Rolling, size-bounded pool of recent papers per arXiv domain, kept in
+    memory so /feed can be sampled locally instead of hitting the search
+    service for every user. Pools are filled at startup and refreshed in the
+    background every `refresh_interval` seconds; a failed refresh keeps the
+    previous pool.
+    """
+
+    def __init__(
+        self,
+        size: int = FEED_POOL_SIZE,
+        refresh_interval: float = FEED_POOL_REFRESH_INTERVAL,
+        enabled: bool = FEED_POOL_ENABLED,
+    ):
+        self.size = size
+        self.refresh_interval = refresh_interval
+        self.enabled = enabled
+        self.logger = logging.getLogger(__name__)
+        self._pools: Dict[str, List[SearchResult]] = {}
+        self._refreshed_at: Dict[str, float] = {}
+        self._fetch: Optional[Callable[[str, int], Awaitable[List[SearchResult]]]] = (
+            None
+        )
+        self._task: Optional[asyncio.Task] = None
+        self.served = 0
+        self.fallbacks = 0
+        self.refresh_failures = 0
+
+    async def start(self, fetch: Callable[[str, int], Awaitable[List[SearchResult]]]):
+        """Fill every pool (bounded by FEED_POOL_STARTUP_TIMEOUT) and start refreshing"""
+        if not self.enabled:
+            return
+        self._fetch = fetch
+        try:
+            await asyncio.wait_for(self.refresh(), timeout=FEED_POOL_STARTUP_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.logger.warning(
+                f"Feed pools not fully populated within {FEED_POOL_STARTUP_TIMEOUT}s"
+            )
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.logger.error(f"Feed pool refresh failed: {e}")
+
+    async def refresh(self):
+        semaphore = asyncio.Semaphore(FEED_POOL_CONCURRENCY)
+
+        async def _refresh_domain(domain: str):
+            async with semaphore:
+                await self.refresh_domain(domain)
+
+        start = time.time()
+        await asyncio.gather(
+            *(_refresh_domain(domain.value) for domain in ArxivDomains)
+        )
+        self.logger.info(f"Feed pools refreshed in {time.time() - start:.2f}s")
+
+    async def refresh_domain(self, domain: str):
+        try:
+            fresh = await self._fetch(domain, self.size)
+        except Exception as e:
+            self.refresh_failures += 1
+            self.logger.warning(f"Could not refresh feed pool for {domain}: {e}")
+            return
+
+        # Newest results first, then the previous pool, without duplicates
+        merged, seen = [], set()
+        for result in fresh + self._pools.get(domain, []):
+            if result.metadata.paper_id not in seen:
+                seen.add(result.metadata.paper_id)
+                merged.append(result)
+        self._pools[domain] = merged[: self.size]
+        self._refreshed_at[domain] = time.time()
+
+    def sample(self, domains: List[str], count: int) -> Optional[List[SearchResult]]:
+        """
+        Up to `count` distinct papers drawn at random from the pools of
+        `domains`, or None if any of those pools is still empty.
+        """
+        if not self.enabled or any(not self._pools.get(d) for d in domains):
+            self.fallbacks += 1
+            return None
+
+        candidates = {}
+        for domain in domains:
+            for result in self._pools[domain]:
+                candidates.setdefault(result.metadata.paper_id, result)
+
+        self.served += 1
+        return random.sample(list(candidates.values()), min(count, len(candidates)))
+
+    def stats(self) -> dict:
+        now = time.time()
+        return {
+            "enabled": self.enabled,
+            "domains": len(self._pools),
+            "papers": sum(len(pool) for pool in self._pools.values()),
+            "oldest_refresh_age": (
+                round(now - min(self._refreshed_at.values()), 1)
+                if self._refreshed_at
+                else None
+            ),
+            "served": self.served,
+            "fallbacks": self.fallbacks,
+            "refresh_failures": self.refresh_failures,
+        }
+
+
+feed_pool = FeedPool()
@@ -0,0 +1,222 @@
+from config import LOG_CONFIG, EMB_MODEL, MANIFEST_PATH, MANIFEST_TTL
+
+from models import ManifestEntry
+
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Optional
+import asyncio
+import fcntl
+import json
+import logging.config
+import os
+import tempfile
+import threading
+import time
+
+logging.config.dictConfig(LOG_CONFIG)
+
+
+class NamespaceManifest:
+    """
+    Local record of which papers have been ingested into the vector store:
+    namespace, chunk count, embedding model and ingestion time.
+
+    Lookups are dictionary reads after a stat of the JSON file, which all
+    workers share: if another worker changed it, it is re-read first, and
+    only entries missing from it go to the vector store. Entries are
+    trusted for `ttl` seconds after they were last verified against the
+    store, so a wiped store is noticed without deleting the file. Writes
+    re-read, change and replace the file under an flock.
+    """
+
+    def __init__(self, path: str = MANIFEST_PATH, ttl: float = MANIFEST_TTL):
+        self.path = path
+        self._lock_path = path + ".lock"
+        self.ttl = ttl
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, ManifestEntry] = {}
+        self._signature = None
+        self.hits = 0
+        self.store_refreshes = 0
+        self.forgotten = 0
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._reload()
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock shared by every process using this manifest"""
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _disk_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_ino
+
+    def _changed_on_disk(self) -> bool:
+        return self._disk_signature() != self._signature
+
+    def _reload(self):
+        """Replace the in-memory entries with the file, if it changed"""
+        signature = self._disk_signature()
+        if signature == self._signature:
+            return
+        if signature is None:
+            with self._lock:
+                self._entries = {}
+                self._signature = None
+            return
+
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Could not read manifest {self.path}: {e}")
+            return
+
+        entries = {}
+        for namespace, entry in data.items():
+            try:
+                entries[namespace] = ManifestEntry(**entry)
+            except Exception:
+                self.logger.warning(f"Skipping malformed manifest entry {namespace}")
+
+        with self._lock:
+            self._entries = entries
+            self._signature = signature
+
+    def _persist(self):
+        with self._lock:
+            data = {ns: entry.model_dump() for ns, entry in self._entries.items()}
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        # Our own write is already in memory
+        self._signature = self._disk_signature()
+
+    def get(self, namespace: str) -> Optional[ManifestEntry]:
+        with self._lock:
+            return self._entries.get(namespace)
+
+    def _fresh(self, entry: Optional[ManifestEntry]) -> bool:
+        return (
+            entry is not None
+            and entry.verified_at is not None
+            and time.time() - entry.verified_at < self.ttl
+        )
+
+    async def lookup(
+        self,
+        namespace: str,
+        refresh: Callable[[], Awaitable[Optional[ManifestEntry]]],
+    ) -> Optional[ManifestEntry]:
+        if self._changed_on_disk():
+            await asyncio.to_thread(self._reload)
+        entry = self.get(namespace)
+        if self._fresh(entry):
+            self.hits += 1
+            return entry
+
+        self.store_refreshes += 1
+        try:
+            refreshed = await refresh()
+        except Exception as e:
+            self.logger.warning(f"Could not verify {namespace} against the store: {e}")
+            return entry
+        if refreshed is None:
+            if entry is not None:
+                await self.forget(namespace)
+            return None
+
+        updates = {"verified_at": time.time()}
+        if entry is not None and refreshed.ingested_at is None:
+            updates["ingested_at"] = entry.ingested_at
+        refreshed = refreshed.model_copy(update=updates)
+        await self._put(refreshed)
+        return refreshed
+
+    async def record(
+        self,
+        namespace: str,
+        chunk_count: int,
+        embedding_model: str = EMB_MODEL,
+    ) -> ManifestEntry:
+        entry = ManifestEntry(
+            namespace=namespace,
+            chunk_count=chunk_count,
+            embedding_model=embedding_model,
+            ingested_at=datetime.now(timezone.utc).isoformat(),
+            verified_at=time.time(),
+        )
+        await self._put(entry)
+        return entry
+
+    async def _put(self, entry: ManifestEntry):
+        def _merge_and_persist():
+            with self._file_lock():
+                self._reload()
+                with self._lock:
+                    self._entries[entry.namespace] = entry
+                self._persist()
+
+        try:
+            await asyncio.to_thread(_merge_and_persist)
+        except Exception as e:
+            self.logger.warning(f"Failed to persist manifest entry: {e}")
+            with self._lock:
+                self._entries[entry.namespace] = entry
+
+    async def forget(self, namespace: str):
+        """Drop a paper whose vectors are gone or were never fully written"""
+
+        def _remove_and_persist() -> bool:
+            with self._file_lock():
+                self._reload()
+                with self._lock:
+                    removed = self._entries.pop(namespace, None)
+                if removed is not None:
+                    self._persist()
+            return removed is not None
+
+        try:
+            removed = await asyncio.to_thread(_remove_and_persist)
+        except Exception as e:
+            self.logger.warning(f"Failed to persist manifest removal: {e}")
+            with self._lock:
+                removed = self._entries.pop(namespace, None) is not None
+
+        if removed:
+            self.forgotten += 1
+            self.logger.info(f"Removed {namespace} from the manifest")
+
+    @staticmethod
+    def needs_reembedding(entry: ManifestEntry) -> bool:
+        return entry.embedding_model is not None and entry.embedding_model != EMB_MODEL
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "papers": len(self._entries),
+                "hits": self.hits,
+                "store_refreshes": self.store_refreshes,
+                "forgotten": self.forgotten,
+            }
+
+
+manifest = NamespaceManifest()
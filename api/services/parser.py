@@ -0,0 +1,243 @@
+from config import (
+    LOG_CONFIG,
+    PARSER_WORKERS,
+    PARSER_QUEUE_SIZE,
+    PARSER_TIMEOUT,
+    PARSER_MAX_TASKS_PER_CHILD,
+)
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import asyncio
+import logging.config
+import threading
+import pymupdf
+from pymupdf4llm import to_markdown
+
+logging.config.dictConfig(LOG_CONFIG)
+
+
+class ParserBusyError(Exception):
+    """Raised when the parsing queue is full and the job is shed"""
+
+
+def _pdf_bytes_to_markdown(pdf_bytes: bytes) -> str:
+    with pymupdf.open(stream=pdf_bytes, filetype="pdf") as doc:
+        return to_markdown(doc)
+
+
+def pdf_page_subset(pdf_bytes: bytes, start: int, stop: int) -> bytes:
+    """A standalone PDF holding only pages [start, stop) of `pdf_bytes`"""
+    with pymupdf.open(stream=pdf_bytes, filetype="pdf") as doc:
+        if start == 0 and stop >= doc.page_count:
+            return pdf_bytes
+        doc.select(list(range(start, stop)))
+        return doc.tobytes(garbage=3, deflate=True)
+
+
+def pdf_page_count(pdf_bytes: bytes) -> int:
+    with pymupdf.open(stream=pdf_bytes, filetype="pdf") as doc:
+        return doc.page_count
+
+
+def page_ranges(page_count: int, pages_per_job: int) -> list[tuple[int, int]]:
+    """Split [0, page_count) into consecutive (start, stop) ranges"""
+    return [
+        (start, min(start + pages_per_job, page_count))
+        for start in range(0, page_count, pages_per_job)
+    ]
+
+
+class PDFParser:
+    """
+    Runs pymupdf4llm in a dedicated process pool so parsing does not hold
+    the GIL of the API worker or compete with the default thread pool.
+
+    At most `workers + queue_size` jobs are admitted at once; anything
+    beyond that raises ParserBusyError. Worker processes are replaced
+    after `max_tasks_per_child` jobs to keep their memory in check, and a
+    pool broken by a dying worker (OOM, MuPDF crash) is replaced on the
+    next job.
+
+    Each uvicorn worker owns one PDFParser, so the host runs
+    WEB_CONCURRENCY of these pools with separate queue bounds. The
+    PARSER_WORKERS and PARSER_QUEUE_SIZE defaults are divided by
+    WEB_CONCURRENCY to keep the totals at one process per CPU.
+    """
+
+    def __init__(
+        self,
+        workers: int = PARSER_WORKERS,
+        queue_size: int = PARSER_QUEUE_SIZE,
+        timeout: float = PARSER_TIMEOUT,
+        max_tasks_per_child: int = PARSER_MAX_TASKS_PER_CHILD,
+    ):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.max_tasks_per_child = max_tasks_per_child
+        self.logger = logging.getLogger(__name__)
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.rejected = 0
+        self.broken = 0
+
+    def start(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    max_tasks_per_child=self.max_tasks_per_child,
+                )
+                self.logger.info(f"PDF parser pool started with {self.workers} workers")
+        return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.logger.info("PDF parser pool shut down")
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+
+    def _discard(self, executor: ProcessPoolExecutor):
+        """Drop a broken pool so the next job starts a fresh one"""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self.broken += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+        self.logger.warning("PDF parser pool broke, replacing it")
+
+    def _submit(self, fn, *args):
+        executor = self.start()
+        try:
+            return executor, executor.submit(fn, *args)
+        except BrokenProcessPool:
+            # The job never ran, so it is safe to retry it on a fresh pool
+            self._discard(executor)
+            executor = self.start()
+            return executor, executor.submit(fn, *args)
+
+    def _admit(self):
+        """Take a queue slot, or raise ParserBusyError when there is none"""
+        with self._lock:
+            if self._pending >= self.workers + self.queue_size:
+                self.rejected += 1
+                raise ParserBusyError(
+                    f"PDF parser queue is full ({self._pending} jobs pending)"
+                )
+            self._pending += 1
+
+    def _release_after(self, futures: list):
+        """Free the job's slot once every one of its futures is done"""
+        remaining = len(futures)
+        lock = threading.Lock()
+
+        def _done(_future):
+            nonlocal remaining
+            with lock:
+                remaining -= 1
+                last = remaining == 0
+            if last:
+                self._release()
+
+        if not futures:
+            self._release()
+        for future in futures:
+            future.add_done_callback(_done)
+
+    async def submit(self, fn, *args):
+        """Run `fn(*args)` in the pool, shedding load when the queue is full"""
+        self._admit()
+        try:
+            executor, future = self._submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        # The slot is only freed once the worker is really done, so jobs that
+        # timed out still count against the queue while they keep running.
+        future.add_done_callback(self._release)
+        return await self._result(executor, future)
+
+    async def _result(self, executor: ProcessPoolExecutor, future):
+        try:
+            result = await asyncio.wait_for(
+                asyncio.wrap_future(future), timeout=self.timeout
+            )
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timed_out += 1
+            raise
+        except BrokenProcessPool:
+            self._discard(executor)
+            with self._lock:
+                self.failed += 1
+            raise
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+
+        with self._lock:
+            self.completed += 1
+        return result
+
+    async def to_markdown(self, pdf_bytes: bytes) -> str:
+        return await self.submit(_pdf_bytes_to_markdown, pdf_bytes)
+
+    async def ranges_to_markdown(
+        self, pdf_bytes: bytes, ranges: list[tuple[int, int]]
+    ) -> list[str | BaseException]:
+        """
+        Convert page ranges of one paper, admitted as a single job.
+
+        A long paper takes one queue slot however many ranges it has, and
+        at most `workers` of its ranges are in the pool at a time. Each
+        worker is sent only the pages of its range. Results (or the
+        exception of a failed range) come back in the order of `ranges`.
+        """
+        self._admit()
+        semaphore = asyncio.Semaphore(self.workers)
+        futures = []
+
+        async def _convert(start: int, stop: int) -> str:
+            async with semaphore:
+                subset = await asyncio.to_thread(
+                    pdf_page_subset, pdf_bytes, start, stop
+                )
+                executor, future = self._submit(_pdf_bytes_to_markdown, subset)
+                futures.append(future)
+                return await self._result(executor, future)
+
+        try:
+            return await asyncio.gather(
+                *(_convert(start, stop) for start, stop in ranges),
+                return_exceptions=True,
+            )
+        finally:
+            self._release_after(futures)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "pending": self._pending,
+                "completed": self.completed,
+                "failed": self.failed,
+                "timed_out": self.timed_out,
+                "rejected": self.rejected,
+                "broken": self.broken,
+            }
+
+
+pdf_parser = PDFParser()
@@ -0,0 +1,52 @@
+from config import VECTOR_QUANTIZATION
+
+from typing import Optional, Tuple
+import numpy as np
+
+QUANTIZATION_MODES = ("none", "float16", "int8")
+
+
+def quantize(
+    vectors, mode: str = VECTOR_QUANTIZATION
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Quantize a (n, d) matrix of vectors. int8 is symmetric scalar
+    quantization and also returns one float32 scale per row.
+    """
+    matrix = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    if mode == "none":
+        return matrix, None
+    if mode == "float16":
+        return matrix.astype(np.float16), None
+    if mode == "int8":
+        scales = np.abs(matrix).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        quantized = np.round(matrix / scales[:, np.newaxis]).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+    raise ValueError(f"Unknown vector quantization: {mode}")
+
+
+def dequantize(matrix, scales: Optional[np.ndarray] = None) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if scales is not None:
+        matrix = matrix * np.asarray(scales, dtype=np.float32)[:, np.newaxis]
+    return matrix
+
+
+def to_bytes(vector, mode: str = VECTOR_QUANTIZATION) -> bytes:
+    """Serialize one vector; int8 blobs start with their float32 scale"""
+    quantized, scales = quantize(vector, mode)
+    prefix = scales.tobytes() if scales is not None else b""
+    return prefix + quantized.tobytes()
+
+
+def from_bytes(blob: bytes, mode: str = VECTOR_QUANTIZATION) -> np.ndarray:
+    if mode == "int8":
+        scale = np.frombuffer(blob[:4], dtype=np.float32)
+        quantized = np.frombuffer(blob, dtype=np.int8, offset=4)
+        return dequantize(quantized[np.newaxis, :], scale)[0]
+    if mode == "float16":
+        return np.frombuffer(blob, dtype=np.float16).astype(np.float32)
+    if mode == "none":
+        return np.frombuffer(blob, dtype=np.float32).copy()
+    raise ValueError(f"Unknown vector quantization: {mode}")
@@ -0,0 +1,68 @@
+from config import (
+    LOG_CONFIG,
+    EMB_MODEL,
+    TOKENIZING_MODEL,
+    GROQ_KEY,
+)
+
+from services.batcher import EmbeddingBatcher
+from services.store import create_vector_store
+from services.embcache import EmbeddingCache
+
+from groq import AsyncGroq
+from light_embed import TextEmbedding
+from chonkie import RecursiveChunker, RecursiveRules
+from transformers import AutoTokenizer
+import asyncio
+import logging.config
+import threading
+import time
+
+logging.config.dictConfig(LOG_CONFIG)
+
+
+class ModelRegistry:
+    """
+    Heavy, paper-independent resources used by VecService: the embedding
+    model, tokenizer, chunker and API clients. Loaded once per process and
+    shared by every paper.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        start = time.time()
+
+        self.model = TOKENIZING_MODEL
+        self.embedding_model = EMB_MODEL
+        self.embedding_client = TextEmbedding(self.embedding_model)
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model)
+        self.chunker = RecursiveChunker(
+            chunk_size=256,
+            rules=RecursiveRules(),
+            tokenizer_or_token_counter=self.tokenizer,
+            return_type="texts",
+        )
+        self.client = AsyncGroq(api_key=GROQ_KEY)
+        self.store = create_vector_store()
+        self.embedding_cache = EmbeddingCache()
+        self.semaphore = asyncio.Semaphore(5)
+        self.batcher = EmbeddingBatcher(self.embedding_client.encode)
+
+        self.logger.info(f"Model registry loaded in {time.time() - start:.2f}s")
+
+
+_registry: ModelRegistry | None = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ModelRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
+
+
+def registry_loaded() -> bool:
+    return _registry is not None
@@ -0,0 +1,362 @@
+from config import (
+    LOG_CONFIG,
+    UPSTASH_URL,
+    UPSTASH_TOKEN,
+    VECTOR_BACKEND,
+    VECTOR_STORE_DIR,
+    VECTOR_QUANTIZATION,
+    VECTOR_RESCORE,
+    VECTOR_RESCORE_OVERSAMPLE,
+    VECTOR_STORE_CACHE_SIZE,
+    UPSERT_BATCH_SIZE,
+    UPSERT_MAX_BYTES,
+    UPSERT_CONCURRENCY,
+    UPSERT_RETRIES,
+)
+
+from models import VectorMatch
+
+from services.quantize import quantize, dequantize
+
+from upstash_vector import AsyncIndex, Vector
+from cachetools import LRUCache
+from abc import ABC, abstractmethod
+from typing import List, Optional
+import numpy as np
+import asyncio
+import json
+import logging.config
+import os
+import shutil
+import tempfile
+import threading
+
+logging.config.dictConfig(LOG_CONFIG)
+
+
+class VectorStore(ABC):
+    """Interface implemented by every vector backend VecService can use"""
+
+    # Backends whose upserts rewrite the whole namespace set this, so that
+    # ingest_pdf sends a paper in one upsert instead of one per batch
+    buffer_ingest = False
+
+    @abstractmethod
+    async def upsert(self, vectors: List[Vector], namespace: str): ...
+
+    @abstractmethod
+    async def query(
+        self, vector: List[float], top_k: int, namespace: str
+    ) -> List[VectorMatch]: ...
+
+    @abstractmethod
+    async def fetch(
+        self, ids: List[str], namespace: str
+    ) -> List[Optional[VectorMatch]]: ...
+
+    @abstractmethod
+    async def count(self, namespace: str) -> int: ...
+
+    @abstractmethod
+    async def delete_namespace(self, namespace: str): ...
+
+
+class UpstashStore(VectorStore):
+    def __init__(self, url: str = UPSTASH_URL, token: str = UPSTASH_TOKEN):
+        self.index = AsyncIndex(url=url, token=token)
+        self.semaphore = asyncio.Semaphore(UPSERT_CONCURRENCY)
+        self.logger = logging.getLogger(__name__)
+
+    def _split_batches(self, vectors: List[Vector]) -> List[List[Vector]]:
+        """Split vectors into requests bounded by count and approximate payload size"""
+        batches, batch, batch_bytes = [], [], 0
+        for vec in vectors:
+            # ~12 bytes per float once JSON-encoded, plus the chunk text
+            size = 12 * len(vec.vector) + len(str(vec.metadata)) + len(vec.id)
+            if batch and (
+                len(batch) >= UPSERT_BATCH_SIZE or batch_bytes + size > UPSERT_MAX_BYTES
+            ):
+                batches.append(batch)
+                batch, batch_bytes = [], 0
+            batch.append(vec)
+            batch_bytes += size
+        if batch:
+            batches.append(batch)
+        return batches
+
+    async def _upsert_batch(self, vectors: List[Vector], namespace: str):
+        for attempt in range(UPSERT_RETRIES):
+            try:
+                async with self.semaphore:
+                    await self.index.upsert(vectors=vectors, namespace=namespace)
+                return
+            except Exception as e:
+                if attempt == UPSERT_RETRIES - 1:
+                    raise
+                delay = 0.5 * 2**attempt
+                self.logger.warning(
+                    f"Upsert of {len(vectors)} vectors failed ({e!r}), retrying in {delay}s"
+                )
+                await asyncio.sleep(delay)
+
+    async def upsert(self, vectors: List[Vector], namespace: str):
+        await asyncio.gather(
+            *(
+                self._upsert_batch(batch, namespace)
+                for batch in self._split_batches(vectors)
+            )
+        )
+
+    async def query(
+        self, vector: List[float], top_k: int, namespace: str
+    ) -> List[VectorMatch]:
+        results = await self.index.query(
+            vector=vector,
+            top_k=top_k,
+            namespace=namespace,
+            include_metadata=True,
+        )
+        return [
+            VectorMatch(id=str(r.id), score=r.score, metadata=r.metadata)
+            for r in results
+        ]
+
+    async def fetch(
+        self, ids: List[str], namespace: str
+    ) -> List[Optional[VectorMatch]]:
+        results = await self.index.fetch(
+            ids=ids, include_metadata=True, namespace=namespace
+        )
+        return [
+            (VectorMatch(id=str(r.id), metadata=r.metadata) if r is not None else None)
+            for r in results
+        ]
+
+    async def count(self, namespace: str) -> int:
+        info = await self.index.info()
+        namespace_info = info.namespaces.get(namespace)
+        if namespace_info is None:
+            return 0
+        # Vectors from a recent upsert stay pending until Upstash indexes them
+        return namespace_info.vector_count + namespace_info.pending_vector_count
+
+    async def delete_namespace(self, namespace: str):
+        await self.index.delete_namespace(namespace)
+
+
+class LocalStore(VectorStore):
+    """
+    In-process backend for single-node deployments, tests and benchmarks.
+
+    Each namespace is a directory holding a matrix of L2-normalized vectors
+    (vectors.npy, memory-mapped for queries) plus ids.json and metadata.json.
+    The matrix is stored as float32, float16 or int8 with per-row scales
+    (scales.npy). With `rescore`, a float32 copy (vectors_full.npy) is kept
+    and the quantized top candidates are re-ranked against it. Scores use
+    Upstash's cosine convention, (1 + cos) / 2.
+
+    Every upsert rewrites the namespace, so ingests are buffered into one
+    write. Loaded namespaces are kept in a bounded LRU.
+    """
+
+    buffer_ingest = True
+
+    def __init__(
+        self,
+        directory: str = VECTOR_STORE_DIR,
+        quantization: str = VECTOR_QUANTIZATION,
+        rescore: bool = VECTOR_RESCORE,
+        cache_size: int = VECTOR_STORE_CACHE_SIZE,
+    ):
+        self.directory = directory
+        self.quantization = quantization
+        self.rescore = rescore and quantization != "none"
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._namespaces: LRUCache = LRUCache(maxsize=cache_size)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, namespace: str) -> str:
+        return os.path.join(self.directory, namespace)
+
+    def _load(self, namespace: str):
+        """
+        Return (matrix, scales, full, ids, metadata) for a namespace,
+        reloading if it changed on disk. scales and full may be None.
+        """
+        path = self._path(namespace)
+        matrix_path = os.path.join(path, "vectors.npy")
+        try:
+            mtime = os.stat(matrix_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            loaded = self._namespaces.get(namespace)
+            if loaded is not None and loaded[0] == mtime:
+                return loaded[1:]
+
+        matrix = np.load(matrix_path, mmap_mode="r")
+        scales = full = None
+        if matrix.dtype == np.int8:
+            scales = np.load(os.path.join(path, "scales.npy"))
+        full_path = os.path.join(path, "vectors_full.npy")
+        if self.rescore and os.path.exists(full_path):
+            full = np.load(full_path, mmap_mode="r")
+        with open(os.path.join(path, "ids.json")) as f:
+            ids = json.load(f)
+        with open(os.path.join(path, "metadata.json")) as f:
+            metadata = json.load(f)
+
+        with self._lock:
+            self._namespaces[namespace] = (mtime, matrix, scales, full, ids, metadata)
+        return matrix, scales, full, ids, metadata
+
+    def _write_atomic(self, path: str, write):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _upsert_sync(self, vectors: List[Vector], namespace: str):
+        with self._write_lock:
+            self._merge_and_write(vectors, namespace)
+
+    def _merge_and_write(self, vectors: List[Vector], namespace: str):
+        path = self._path(namespace)
+        os.makedirs(path, exist_ok=True)
+
+        loaded = self._load(namespace)
+        if loaded is None:
+            rows, ids, metadata = [], [], []
+        else:
+            matrix, scales, full, ids, metadata = loaded
+            # Re-quantize from full precision when it is available
+            existing = full if full is not None else dequantize(matrix, scales)
+            rows = list(np.array(existing, dtype=np.float32))
+            ids, metadata = list(ids), list(metadata)
+
+        positions = {vec_id: i for i, vec_id in enumerate(ids)}
+        for vec in vectors:
+            row = np.asarray(vec.vector, dtype=np.float32)
+            norm = np.linalg.norm(row)
+            if norm > 0:
+                row = row / norm
+            if vec.id in positions:
+                rows[positions[vec.id]] = row
+                metadata[positions[vec.id]] = vec.metadata
+            else:
+                positions[vec.id] = len(ids)
+                rows.append(row)
+                ids.append(vec.id)
+                metadata.append(vec.metadata)
+
+        full = np.vstack(rows).astype(np.float32)
+        matrix, scales = quantize(full, self.quantization)
+        # Sidecar files first, so a reader that sees the new matrix also
+        # sees ids/metadata/scales at least as new as it
+        self._write_atomic(
+            os.path.join(path, "ids.json"), lambda f: f.write(json.dumps(ids).encode())
+        )
+        self._write_atomic(
+            os.path.join(path, "metadata.json"),
+            lambda f: f.write(json.dumps(metadata).encode()),
+        )
+        sidecars = {
+            "scales.npy": scales,
+            "vectors_full.npy": full if self.rescore else None,
+        }
+        for name, array in sidecars.items():
+            sidecar = os.path.join(path, name)
+            if array is not None:
+                self._write_atomic(sidecar, lambda f: np.save(f, array))
+            elif os.path.exists(sidecar):
+                os.unlink(sidecar)
+        self._write_atomic(
+            os.path.join(path, "vectors.npy"), lambda f: np.save(f, matrix)
+        )
+
+    async def upsert(self, vectors: List[Vector], namespace: str):
+        if vectors:
+            await asyncio.to_thread(self._upsert_sync, vectors, namespace)
+
+    async def query(
+        self, vector: List[float], top_k: int, namespace: str
+    ) -> List[VectorMatch]:
+        loaded = self._load(namespace)
+        if loaded is None:
+            return []
+        matrix, scales, full, ids, metadata = loaded
+
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        scores = np.asarray(matrix @ query, dtype=np.float32)
+        if scales is not None:
+            scores = scores * scales
+        k = min(top_k, len(scores))
+        if k <= 0:
+            return []
+
+        if full is not None:
+            n = min(len(scores), k * VECTOR_RESCORE_OVERSAMPLE)
+            candidates = np.argpartition(-scores, n - 1)[:n]
+            exact = np.asarray(full[candidates], dtype=np.float32) @ query
+            order = np.argsort(-exact)[:k]
+            top, top_scores = candidates[order], exact[order]
+        else:
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            top_scores = scores[top]
+
+        return [
+            VectorMatch(id=ids[i], score=float((1 + score) / 2), metadata=metadata[i])
+            for i, score in zip(top, top_scores)
+        ]
+
+    async def fetch(
+        self, ids: List[str], namespace: str
+    ) -> List[Optional[VectorMatch]]:
+        loaded = self._load(namespace)
+        if loaded is None:
+            return [None for _ in ids]
+        *_, stored_ids, metadata = loaded
+
+        positions = {vec_id: i for i, vec_id in enumerate(stored_ids)}
+        return [
+            (
+                VectorMatch(id=vec_id, metadata=metadata[positions[vec_id]])
+                if vec_id in positions
+                else None
+            )
+            for vec_id in ids
+        ]
+
+    async def count(self, namespace: str) -> int:
+        loaded = self._load(namespace)
+        return len(loaded[-2]) if loaded is not None else 0
+
+    def _delete_sync(self, namespace: str):
+        with self._write_lock:
+            shutil.rmtree(self._path(namespace), ignore_errors=True)
+            with self._lock:
+                self._namespaces.pop(namespace, None)
+
+    async def delete_namespace(self, namespace: str):
+        await asyncio.to_thread(self._delete_sync, namespace)
+
+
+def create_vector_store(backend: str = VECTOR_BACKEND) -> VectorStore:
+    if backend == "local":
+        return LocalStore()
+    if backend == "upstash":
+        return UpstashStore()
+    raise ValueError(f"Unknown vector backend: {backend}")
@@ -0,0 +1,141 @@
+from config import (
+    LOG_CONFIG,
+    CACHE_DIR,
+    GEM_MODEL,
+    FIRST_PROMPT,
+    SECOND_PROMPT,
+    THIRD_PROMPT,
+    CITATIONS_PROMPT,
+    COMBINED_PROMPT,
+    SUMMARY_CACHE_MAX_BYTES,
+    SUMMARY_MEMORY_CACHE_BYTES,
+)
+
+from models import EndResponse
+from services.acquire import pdf_cache_key, latest_max_age
+from services.cache import TextCache, SingleFlight, Broadcast
+
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+import asyncio
+import hashlib
+import logging.config
+import os
+
+logging.config.dictConfig(LOG_CONFIG)
+
+PROMPTS_HASH = hashlib.sha256(
+    "\0".join(
+        [FIRST_PROMPT, SECOND_PROMPT, THIRD_PROMPT, CITATIONS_PROMPT, COMBINED_PROMPT]
+    ).encode("utf-8")
+).hexdigest()[:16]
+
+
+class SummaryStore:
+    """
+    Persistent store of generated EndResponses.
+
+    Entries are keyed by (canonical arXiv ID, Gemini model, prompt hash), so
+    changing the model or any summary prompt naturally invalidates them.
+    Concurrent first requests for the same paper share one generation, and
+    so do concurrent streams of it.
+    """
+
+    def __init__(
+        self,
+        directory: str = os.path.join(CACHE_DIR, "summaries"),
+        max_bytes: int = SUMMARY_CACHE_MAX_BYTES,
+        memory_max_bytes: int = SUMMARY_MEMORY_CACHE_BYTES,
+        model_name: str = GEM_MODEL,
+    ):
+        self.cache = TextCache(directory, max_bytes, memory_max_bytes)
+        self.model_name = model_name
+        self.flights = SingleFlight()
+        self.streams = Broadcast()
+        self.logger = logging.getLogger(__name__)
+
+    def key(self, arxiv_id: str) -> str:
+        return f"{pdf_cache_key(arxiv_id)}:{self.model_name}:{PROMPTS_HASH}"
+
+    async def get(self, arxiv_id: str) -> Optional[EndResponse]:
+        try:
+            key = self.key(arxiv_id)
+            data = await asyncio.to_thread(self.cache.get, key, latest_max_age(key))
+        except Exception as e:
+            self.logger.warning(f"Summary store lookup failed for {arxiv_id}: {e}")
+            return None
+
+        if data is None:
+            return None
+
+        try:
+            return EndResponse.model_validate_json(data)
+        except Exception as e:
+            self.logger.warning(f"Discarding unreadable summaries for {arxiv_id}: {e}")
+            return None
+
+    async def set(self, arxiv_id: str, summaries: EndResponse):
+        try:
+            await asyncio.to_thread(
+                self.cache.set, self.key(arxiv_id), summaries.model_dump_json()
+            )
+        except Exception as e:
+            self.logger.warning(f"Failed to store summaries for {arxiv_id}: {e}")
+
+    async def get_or_generate(
+        self,
+        arxiv_id: str,
+        generate: Callable[[], Awaitable[Optional[EndResponse]]],
+    ) -> Optional[EndResponse]:
+        """Return stored summaries, or run `generate` once for all concurrent callers"""
+        cached = await self.get(arxiv_id)
+        if cached is not None:
+            return cached
+
+        async def _generate_and_store() -> Optional[EndResponse]:
+            cached = await self.get(arxiv_id)
+            if cached is not None:
+                return cached
+
+            summaries = await generate()
+            if summaries is not None:
+                await self.set(arxiv_id, summaries)
+            return summaries
+
+        return await self.flights.do(self.key(arxiv_id), _generate_and_store)
+
+    async def stream_or_generate(
+        self,
+        arxiv_id: str,
+        generate: Callable[[], AsyncIterator[tuple[Optional[str], Any, Optional[str]]]],
+    ) -> AsyncIterator[tuple[Optional[str], Any, Optional[str]]]:
+        """
+        Yield (section, data, error) as `generate` produces them. Concurrent
+        streams of the same paper follow one generation, and the EndResponse
+        is stored once every section has succeeded.
+        """
+
+        async def _generate_and_store():
+            completed = {}
+            async for section, data, error in generate():
+                if section is not None and error is None:
+                    completed[section] = data
+                yield section, data, error
+
+            if len(completed) == len(EndResponse.model_fields):
+                await self.set(arxiv_id, EndResponse(**completed))
+
+        async for item in self.streams.subscribe(
+            self.key(arxiv_id), _generate_and_store
+        ):
+            yield item
+
+    def stats(self) -> dict:
+        stats = self.cache.stats()
+        stats["in_flight"] = len(self.flights)
+        stats["streams_in_flight"] = len(self.streams)
+        stats["streams_coalesced"] = self.streams.coalesced
+        stats["coalesced"] = self.flights.coalesced
+        return stats
+
+
+summary_store = SummaryStore()
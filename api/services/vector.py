@@ -1,69 +1,72 @@
 from config import (
-    UPSTASH_URL,
-    UPSTASH_TOKEN,
     LOG_CONFIG,
     RAG_SYSTEM_PROMPT,
     RAG_CHAT_MODEL,
-    EMB_MODEL,
-    TOKENIZING_MODEL,
-    GROQ_KEY,
-    CACHE_SIZE,
+    RAG_USER_PROMPT,
+    VEC_SERVICE_CACHE_SIZE,
+    INGEST_BATCH_SIZE,
+    INGEST_QUEUE_SIZE,
+    RAG_CONTEXT_TOKENS,
+    RAG_DEDUP_THRESHOLD,
 )
 
 from services.acquire import ArxivPDF
+from services.registry import get_registry
+from services.answers import answer_cache, AnswerUnavailable, SemanticAnswerIndex
+from services.manifest import manifest
 
-from groq import AsyncGroq
-from light_embed import TextEmbedding
-from chonkie import RecursiveChunker, RecursiveRules
-from upstash_vector import Index, Vector
-from transformers import AutoTokenizer
-from typing import List, Optional
+from models import VectorMatch, ManifestEntry
+
+from upstash_vector import Vector
+from typing import AsyncIterator, List, Optional
 import logging
 import logging.config
 import asyncio
 from cachetools import LRUCache
 import threading
+import time
 
 logging.config.dictConfig(LOG_CONFIG)
 
 
 class SingletonMeta(type):
-    _instances = {}
+    """
+    One VecService per arXiv ID, held in a bounded LRU so per-paper state
+    is dropped for papers that have not been touched in a while.
+    """
+
+    _instances = LRUCache(maxsize=VEC_SERVICE_CACHE_SIZE)
     _lock = threading.Lock()
 
     def __call__(cls, *args, **kwargs):
-        key = (cls, args[0] if args else None)
+        key = (cls, args[0].lower() if args else None)
 
         with cls._lock:
-            if key not in cls._instances:
-                cls._instances[key] = super().__call__(*args, **kwargs)
-        return cls._instances[key]
+            instance = cls._instances.get(key)
+            if instance is None:
+                instance = super().__call__(*args, **kwargs)
+                cls._instances[key] = instance
+        return instance
 
 
 class VecService(metaclass=SingletonMeta):
     def __init__(self, arxiv_id: str):
-        # Check if this instance has been initialized before
-        if not hasattr(self, "initialized") or self.arxiv_id != arxiv_id.lower():
-            self.arxiv_id = arxiv_id.lower()
-            self.model = TOKENIZING_MODEL
-            self.embedding_model = EMB_MODEL
-            self.embedding_client = TextEmbedding(self.embedding_model)
-            self.client = AsyncGroq(api_key=GROQ_KEY)
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model)
-            self.chunker = RecursiveChunker(
-                chunk_size=256,
-                rules=RecursiveRules(),
-                tokenizer_or_token_counter=self.tokenizer,
-                return_type="texts",
-            )
-            self.index = Index(url=UPSTASH_URL, token=UPSTASH_TOKEN)
-            self.logger = logging.getLogger(__name__)
-            self.embedding_cache = LRUCache(maxsize=CACHE_SIZE)
-            self.semaphore = asyncio.Semaphore(5)
-            self.initialized = True
-        else:
-            # Just update the arxiv_id if it's different
-            self.arxiv_id = arxiv_id.lower()
+        registry = get_registry()
+
+        self.arxiv_id = arxiv_id.lower()
+        self.namespace = self.arxiv_id.replace("/", "_")
+        self.model = registry.model
+        self.embedding_model = registry.embedding_model
+        self.embedding_client = registry.embedding_client
+        self.client = registry.client
+        self.tokenizer = registry.tokenizer
+        self.chunker = registry.chunker
+        self.store = registry.store
+        self.logger = logging.getLogger(__name__)
+        self.embedding_cache = registry.embedding_cache
+        self.semaphore = registry.semaphore
+        self.batcher = registry.batcher
+        self.past_answers = SemanticAnswerIndex()
 
     async def _embed_text(self, text: str) -> Optional[List[float]]:
         """Embed a single text with caching and error handling"""
@@ -77,25 +80,20 @@ class VecService(metaclass=SingletonMeta):
             )
             text = text[:1000]
 
-        if text in self.embedding_cache:
+        cached = await asyncio.to_thread(self.embedding_cache.get, text)
+        if cached is not None:
             self.logger.debug("Cache hit for text embedding")
-            return self.embedding_cache[text]
+            return cached
 
         try:
-            async with self.semaphore:
-                loop = asyncio.get_event_loop()
-                embedding_future = loop.run_in_executor(
-                    None, lambda: self.embedding_client.encode([text])[0]
-                )
+            embedding = await asyncio.wait_for(self.batcher.embed(text), timeout=60.0)
 
-                embedding = await asyncio.wait_for(embedding_future, timeout=60.0)
+            if embedding is None or len(embedding) == 0:
+                self.logger.error("Empty embedding vector received")
+                return None
 
-                if embedding is None or len(embedding) == 0:
-                    self.logger.error("Empty embedding vector received")
-                    return None
-
-                self.embedding_cache[text] = embedding
-                return embedding
+            await asyncio.to_thread(self.embedding_cache.set, text, embedding)
+            return embedding
 
         except asyncio.TimeoutError:
             self.logger.error("Timeout while embedding text")
@@ -104,82 +102,183 @@ class VecService(metaclass=SingletonMeta):
             self.logger.error(f"Error embedding text: {e}")
             return None
 
-    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
-        """Embed a batch of texts with error handling"""
+    async def _embed_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Embed a batch of texts, returning one embedding (or None on failure)
+        per input text, in order. Cached texts are not re-embedded.
+        """
         if not texts:
             return []
 
+        embeddings: List[Optional[List[float]]] = await asyncio.to_thread(
+            self.embedding_cache.get_many, texts
+        )
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if not missing:
+            return embeddings
+
+        missing_texts = [texts[i] for i in missing]
         try:
-            try:
-                async with self.semaphore:
-                    loop = asyncio.get_event_loop()
-                    embedding_future = loop.run_in_executor(
-                        None,
-                        lambda: self.embedding_client.encode(texts),
-                    )
+            async with self.semaphore:
+                loop = asyncio.get_event_loop()
+                embedding_future = loop.run_in_executor(
+                    None,
+                    lambda: self.embedding_client.encode(missing_texts),
+                )
 
-                    embeddings = await asyncio.wait_for(embedding_future, timeout=30.0)
-                    if embeddings is not None and len(embeddings) == len(texts):
-                        self.logger.info(
-                            f"Successfully batch embedded {len(embeddings)} texts"
-                        )
-                        for text, embedding in zip(texts, embeddings):
-                            self.embedding_cache[text] = embedding
-                        return embeddings
-                    else:
-                        self.logger.warning(
-                            "Batch embedding returned incomplete results, falling back to individual embedding"
-                        )
-            except Exception as e:
-                self.logger.warning(
-                    f"Batch embedding failed: {e}, falling back to individual embedding"
+                encoded = await asyncio.wait_for(embedding_future, timeout=30.0)
+            if encoded is not None and len(encoded) == len(missing_texts):
+                for i, embedding in zip(missing, encoded):
+                    embeddings[i] = embedding
+                await asyncio.to_thread(
+                    self.embedding_cache.set_many, missing_texts, encoded
                 )
+                return embeddings
 
-            valid_embeddings = []
-            for text in texts:
-                if not isinstance(text, str) or not text.strip():
-                    self.logger.warning("Skipping invalid text for embedding")
-                    continue
+            self.logger.warning(
+                "Batch embedding returned incomplete results, falling back to individual embedding"
+            )
+        except Exception as e:
+            self.logger.warning(
+                f"Batch embedding failed: {e!r}, falling back to individual embedding"
+            )
 
-                embedding = await self._embed_text(text)
-                if embedding:
-                    valid_embeddings.append(embedding)
+        # Only this batch falls back; the micro-batcher regroups the texts
+        fallback = await asyncio.gather(
+            *(self._embed_text(text) for text in missing_texts)
+        )
+        for i, embedding in zip(missing, fallback):
+            embeddings[i] = embedding
+        return embeddings
 
-            return valid_embeddings
+    async def chunk_pdf(self) -> List[str]:
+        async with ArxivPDF(self.arxiv_id) as pdf:
+            pdf_md = await pdf.fetch_arxiv_pdf_markdown()
 
-        except Exception as e:
-            self.logger.error(f"Error in batch embedding: {e}")
+        if pdf_md is None:
+            self.logger.error("No markdown extracted from PDF")
             return []
 
-    async def chunk_and_embed_pdf(self) -> list[Vector]:
-        try:
-            async with ArxivPDF(self.arxiv_id) as pdf:
-                pdf_md = await pdf.fetch_arxiv_pdf_markdown()
-
-            if pdf_md is None:
-                self.logger.error("No markdown extracted from PDF")
-                return []
-
-            chunks = self.chunker.chunk(pdf_md)
-            self.logger.info(f"Generated {len(chunks)} chunks from PDF")
-
-            embeddings = await self._embed_batch(chunks)
-            valid_chunks = chunks[: len(embeddings)]
-            self.logger.info(f"Embedded {len(embeddings)}/{len(chunks)} chunks")
-            vecs = [
-                Vector(
-                    id=f"{self.arxiv_id}_{i}",
-                    vector=emb,
-                    metadata={"chunk": chunk},
+        chunks = await asyncio.to_thread(self.chunker.chunk, pdf_md)
+        self.logger.info(f"Generated {len(chunks)} chunks from PDF")
+        return [chunk for chunk in chunks if isinstance(chunk, str) and chunk.strip()]
+
+    async def chunk_and_embed_pdf(
+        self, batch_size: int = INGEST_BATCH_SIZE
+    ) -> AsyncIterator[List[Vector]]:
+        """
+        Yield the paper's vectors in batches of at most `batch_size` chunks.
+        Vector IDs stay contiguous ({arxiv_id}_0, _1, ...) even if some
+        chunks fail to embed.
+        """
+        chunks = await self.chunk_pdf()
+        next_id = 0
+
+        for start in range(0, len(chunks), batch_size):
+            batch = chunks[start : start + batch_size]
+            embeddings = await self._embed_batch(batch)
+
+            vecs = []
+            for chunk, embedding in zip(batch, embeddings):
+                if embedding is None:
+                    continue
+                vecs.append(
+                    Vector(
+                        id=f"{self.arxiv_id}_{next_id}",
+                        vector=embedding,
+                        metadata={
+                            "chunk": chunk,
+                            "embedding_model": self.embedding_model,
+                        },
+                    )
                 )
-                for i, (chunk, emb) in enumerate(zip(valid_chunks, embeddings))
-            ]
-            self.logger.info(f"Created {len(vecs)} vectors for insertion")
-            return vecs
+                next_id += 1
 
+            self.logger.info(
+                f"Embedded {len(vecs)}/{len(batch)} chunks of batch starting at {start}"
+            )
+            if vecs:
+                yield vecs
+
+    async def ingest_pdf(self) -> int:
+        """
+        Chunk, embed and upsert the paper as a pipeline: each batch is
+        upserted while the next one is being embedded, with a bounded queue
+        between the two stages. Returns the number of vectors inserted.
+
+        The first vector ({arxiv_id}_0) is held back and upserted last with
+        the final chunk_count in its metadata, so its presence marks a
+        complete ingest. If ingestion fails part way, whatever was written
+        to the namespace is deleted. Stores that set buffer_ingest get the
+        whole paper in one upsert at the end.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=INGEST_QUEUE_SIZE)
+        done = object()
+        wrote = False
+
+        async def produce():
+            try:
+                async for vecs in self.chunk_and_embed_pdf():
+                    await queue.put(vecs)
+                await queue.put(done)
+            except Exception as e:
+                # Hand the failure (e.g. ParserBusyError) to the consumer
+                await queue.put(e)
+
+        async def consume() -> int:
+            nonlocal wrote
+            inserted = 0
+            first = None
+            buffered: List[Vector] = []
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                if first is None:
+                    first, item = item[0], item[1:]
+                if item and self.store.buffer_ingest:
+                    buffered.extend(item)
+                elif item:
+                    wrote = True
+                    await self._upsert(item)
+                inserted += len(item)
+
+            if first is not None:
+                first.metadata = {**(first.metadata or {}), "chunk_count": inserted + 1}
+                wrote = wrote or bool(buffered)
+                await self._upsert(buffered + [first])
+                inserted += 1
+            return inserted
+
+        producer = asyncio.create_task(produce())
+        try:
+            inserted = await consume()
+        except Exception:
+            if wrote:
+                await self._discard_partial_ingest()
+            raise
+        finally:
+            producer.cancel()
+
+        self.logger.info(
+            f"Successfully inserted {inserted} vectors into namespace '{self.arxiv_id}'"
+        )
+        if inserted:
+            await manifest.record(self.namespace, inserted, self.embedding_model)
+        return inserted
+
+    async def _discard_partial_ingest(self):
+        self.logger.warning(f"Ingest of {self.arxiv_id} failed, removing its vectors")
+        await manifest.forget(self.namespace)
+        try:
+            await self.store.delete_namespace(self.namespace)
         except Exception as e:
-            self.logger.error(f"Error in chunk_and_embed_pdf: {e}", exc_info=True)
-            return []
+            self.logger.error(f"Could not delete namespace {self.namespace}: {e}")
+
+    async def _upsert(self, vecs: List[Vector]):
+        await self.store.upsert(vecs, self.namespace)
 
     async def insert_vectors(self, vecs: List[Vector]):
         try:
@@ -187,7 +286,7 @@ class VecService(metaclass=SingletonMeta):
                 self.logger.warning("No vectors to insert")
                 return
 
-            self.index.upsert(vectors=vecs, namespace=self.arxiv_id.replace("/", "_"))
+            await self._upsert(vecs)
             self.logger.info(
                 f"Successfully inserted {len(vecs)} vectors into namespace '{self.arxiv_id}'"
             )
@@ -199,62 +298,211 @@ class VecService(metaclass=SingletonMeta):
             self.logger.info(
                 f"Starting query for: '{query}' in namespace '{self.arxiv_id}'."
             )
-
-            query_vec = await self._embed_text(query)
-
-            if query_vec is None:
-                self.logger.error("Failed to embed query")
-                return "Sorry, I couldn't process your query at this time."
-
-            results = self.index.query(
-                vector=query_vec,
-                top_k=top_k,
-                namespace=self.arxiv_id.replace("/", "_"),
-                include_metadata=True,
-            )
-            self.logger.info(f"Query completed. Found {len(results)} results.")
-
-            if not results:
-                self.logger.warning("No results found in vector store")
-                return "I couldn't find relevant information to answer your question."
-
-            chunks = [results[i].metadata["chunk"] for i in range(len(results))]
-
-            context = ""
-            for chunk in chunks:
-                context += chunk + "\n\n"
-
-            context = context[:4096]
-
-            self.logger.info("Context assembled.")
-            self.logger.info(f"Query: {query} | Context Length: {len(context)}")
-
-            response = await self.client.chat.completions.create(
-                model=RAG_CHAT_MODEL,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": RAG_SYSTEM_PROMPT,
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Answer the question: {query}. Use only information provided here: {context}",
-                    },
-                ],
+            return await answer_cache.get_or_compute(
+                self.arxiv_id, query, top_k, lambda: self._answer(query, top_k)
             )
-            return response.choices[0].message.content
+        except AnswerUnavailable as e:
+            return str(e)
         except Exception as e:
             self.logger.error(f"Error in query_index: {e}", exc_info=True)
             return "Sorry, an error occurred while processing your query."
 
+    async def _embed_query(self, query: str):
+        query_vec = await self._embed_text(query)
+
+        if query_vec is None:
+            self.logger.error("Failed to embed query")
+            raise AnswerUnavailable(
+                "Sorry, I couldn't process your query at this time."
+            )
+        return query_vec
+
+    def _semantic_hit(self, query: str, query_vec, top_k: int) -> Optional[str]:
+        similar_answer = self.past_answers.lookup(query_vec, top_k)
+        if similar_answer is not None:
+            self.logger.info(f"Semantic cache hit for '{query}' in {self.arxiv_id}")
+            answer_cache.record_semantic_hit()
+        return similar_answer
+
+    def _pack_context(
+        self, results: List[VectorMatch], budget: int = RAG_CONTEXT_TOKENS
+    ) -> tuple[str, int]:
+        """
+        Assemble the prompt context from whole chunks, best score first, up to
+        `budget` tokens. Chunks contained in, or near-duplicates of, an
+        already selected chunk are skipped instead of spending budget twice.
+        """
+        selected: List[str] = []
+        selected_tokens: List[set] = []
+        used = 0
+
+        for match in sorted(results, key=lambda r: r.score, reverse=True):
+            chunk = (match.metadata or {}).get("chunk", "").strip()
+            if not chunk:
+                continue
+
+            token_ids = self.tokenizer.encode(chunk, add_special_tokens=False)
+            token_set = set(token_ids)
+            if any(chunk in other or other in chunk for other in selected) or any(
+                len(token_set & other) / max(len(token_set | other), 1)
+                >= RAG_DEDUP_THRESHOLD
+                for other in selected_tokens
+            ):
+                continue
+
+            if used + len(token_ids) > budget:
+                if selected:
+                    continue
+                # A single oversized chunk is cut on a token boundary
+                token_ids = token_ids[:budget]
+                chunk = self.tokenizer.decode(token_ids)
+
+            selected.append(chunk)
+            selected_tokens.append(token_set)
+            used += len(token_ids)
+
+        return "\n\n".join(selected), used
+
+    async def _build_messages(self, query: str, query_vec, top_k: int) -> List[dict]:
+        results = await self.store.query(query_vec, top_k, self.namespace)
+        self.logger.info(f"Query completed. Found {len(results)} results.")
+
+        if not results:
+            self.logger.warning("No results found in vector store")
+            # The namespace is empty, so the paper has to be ingested again
+            await manifest.forget(self.namespace)
+            raise AnswerUnavailable(
+                "I couldn't find relevant information to answer your question."
+            )
+
+        context, context_tokens = self._pack_context(results)
+
+        self.logger.info("Context assembled.")
+        self.logger.info(
+            f"Query: {query} | Context Length: {len(context)} chars, {context_tokens} tokens"
+        )
+
+        return [
+            {
+                "role": "system",
+                "content": RAG_SYSTEM_PROMPT,
+            },
+            {
+                "role": "user",
+                "content": RAG_USER_PROMPT.format(query=query, context=context),
+            },
+        ]
+
+    async def _answer(self, query: str, top_k: int) -> str:
+        query_vec = await self._embed_query(query)
+
+        similar_answer = self._semantic_hit(query, query_vec, top_k)
+        if similar_answer is not None:
+            return similar_answer
+
+        messages = await self._build_messages(query, query_vec, top_k)
+        response = await self.client.chat.completions.create(
+            model=RAG_CHAT_MODEL,
+            messages=messages,
+        )
+        answer = response.choices[0].message.content
+        self.past_answers.add(query_vec, top_k, answer)
+        return answer
+
+    async def stream_answer(self, query: str, top_k: int = 5) -> AsyncIterator[str]:
+        """
+        Yield the answer as Groq produces it. Cached answers are yielded in
+        one piece; a fully streamed answer is added to both answer caches.
+        Closing the generator closes the upstream Groq stream.
+        """
+        try:
+            key = answer_cache.key(self.arxiv_id, query, top_k)
+            cached = answer_cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+            start = time.time()
+            query_vec = await self._embed_query(query)
+
+            similar_answer = self._semantic_hit(query, query_vec, top_k)
+            if similar_answer is not None:
+                answer_cache.set(key, similar_answer, time.time() - start)
+                yield similar_answer
+                return
+
+            messages = await self._build_messages(query, query_vec, top_k)
+        except AnswerUnavailable as e:
+            yield str(e)
+            return
+
+        stream = await self.client.chat.completions.create(
+            model=RAG_CHAT_MODEL,
+            messages=messages,
+            stream=True,
+        )
+        parts = []
+        try:
+            async for chunk in stream:
+                token = chunk.choices[0].delta.content if chunk.choices else None
+                if token:
+                    parts.append(token)
+                    yield token
+        finally:
+            await stream.close()
+
+        answer = "".join(parts)
+        answer_cache.set(key, answer, time.time() - start)
+        self.past_answers.add(query_vec, top_k, answer)
+
     async def vectors_exist(self) -> bool:
         try:
-            result = self.index.fetch(
-                ids=[f"{self.arxiv_id}_0"], namespace=self.arxiv_id.replace("/", "_")
-            )
-            self.logger.info(f"Fetch result for {self.arxiv_id}: {result}")
+            result = await self.store.fetch([f"{self.arxiv_id}_0"], self.namespace)
+            self.logger.debug(f"Fetch result for {self.arxiv_id}: {result}")
 
             return bool(result) and any(item is not None for item in result)
         except Exception as e:
             self.logger.error(f"Error checking vector existence: {e}", exc_info=True)
             return False
+
+    async def _manifest_from_store(self) -> Optional[ManifestEntry]:
+        """
+        Rebuild a manifest entry from the vector store. A paper counts as
+        ingested only if {arxiv_id}_0 carries the chunk_count written at the
+        end of ingest_pdf and the namespace still holds that many vectors.
+        Store errors propagate so the manifest can keep its current entry.
+        """
+        result = await self.store.fetch([f"{self.arxiv_id}_0"], self.namespace)
+        first = result[0] if result else None
+        if first is None:
+            return None
+
+        chunk_count = (first.metadata or {}).get("chunk_count")
+        if chunk_count is None:
+            self.logger.info(f"{self.arxiv_id} has no completed ingest")
+            return None
+
+        stored = await self.store.count(self.namespace)
+        if stored < chunk_count:
+            self.logger.info(
+                f"{self.arxiv_id} has {stored} of {chunk_count} vectors, needs re-ingesting"
+            )
+            return None
+
+        return ManifestEntry(
+            namespace=self.namespace,
+            chunk_count=chunk_count,
+            embedding_model=(first.metadata or {}).get("embedding_model"),
+        )
+
+    async def is_ready(self) -> bool:
+        """True if the paper is ingested with the current embedding model"""
+        entry = await manifest.lookup(self.namespace, self._manifest_from_store)
+        if entry is None:
+            return False
+        if manifest.needs_reembedding(entry):
+            self.logger.info(
+                f"{self.arxiv_id} was embedded with {entry.embedding_model}, needs re-embedding"
+            )
+            return False
+        return True
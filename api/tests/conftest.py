@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# The API imports its modules relative to api/ (as uvicorn runs it there)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="densair-tests-"))
@@ -0,0 +1,37 @@
+"""
+The batcher must not delay a lone query, and must still batch under load.
+"""
+
+from services.batcher import EmbeddingBatcher
+
+import asyncio
+import time
+
+
+def _encode(texts):
+    time.sleep(0.01)
+    return [[float(len(text))] for text in texts]
+
+
+def test_lone_text_is_encoded_without_waiting():
+    batcher = EmbeddingBatcher(_encode, max_batch=32, max_wait=1.0)
+
+    async def run():
+        start = time.perf_counter()
+        for text in ("one", "three"):
+            await batcher.embed(text)
+        return time.perf_counter() - start
+
+    assert asyncio.run(run()) < 0.5
+    assert batcher.stats()["batches"] == 2
+
+
+def test_texts_arriving_during_a_batch_are_batched():
+    batcher = EmbeddingBatcher(_encode, max_batch=32, max_wait=0.005)
+
+    async def run():
+        return await asyncio.gather(*(batcher.embed("x" * i) for i in range(1, 21)))
+
+    results = asyncio.run(run())
+    assert results == [[float(i)] for i in range(1, 21)]
+    assert batcher.stats()["batches"] == 2
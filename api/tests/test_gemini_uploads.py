@@ -0,0 +1,216 @@
+"""
+Extractor against a local fake of the Gemini Files and generateContent
+APIs: every paper must be uploaded once and its handle reused.
+"""
+
+from services import extract
+from services.extract import Extractor
+from config import FIRST_PROMPT, SECOND_PROMPT, THIRD_PROMPT, CITATIONS_PROMPT
+from models import TermsAndSummaries, FigureSummaries, OverallSummary, Citations
+
+from aiohttp import web
+from collections import Counter
+import asyncio
+
+import pytest
+
+PROMPTS = [
+    (THIRD_PROMPT, OverallSummary),
+    (FIRST_PROMPT, TermsAndSummaries),
+    (SECOND_PROMPT, FigureSummaries),
+    (CITATIONS_PROMPT, Citations),
+]
+
+
+class FakeGemini:
+    def __init__(self):
+        self.base_url = None
+        self.uploads = Counter()
+        self.pending = {}
+        self.dropped = set()
+        self.rate_limited = 0
+        self.file_requests = 0
+        self.inline_requests = 0
+        self.app = web.Application()
+        self.app.router.add_post("/upload/v1beta/files", self.create_file)
+        self.app.router.add_post("/upload-session/{session}", self.upload_bytes)
+        self.app.router.add_get("/v1beta/files/{name}", self.get_file)
+        self.app.router.add_post("/v1beta/models/{call}", self.generate_content)
+
+    async def start(self):
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}/"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    def _file(self, name: str) -> dict:
+        return {
+            "name": f"files/{name}",
+            "uri": f"{self.base_url}v1beta/files/{name}",
+            "mimeType": "application/pdf",
+            "state": "ACTIVE",
+        }
+
+    async def create_file(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        paper = body["file"]["displayName"]
+        self.uploads[paper] += 1
+        session = f"{paper[:12]}-{self.uploads[paper]}"
+        self.pending[session] = paper
+        return web.json_response(
+            {},
+            headers={"X-Goog-Upload-URL": f"{self.base_url}upload-session/{session}"},
+        )
+
+    async def upload_bytes(self, request: web.Request) -> web.Response:
+        await request.read()
+        session = request.match_info["session"]
+        return web.json_response(
+            {"file": self._file(session)}, headers={"X-Goog-Upload-Status": "final"}
+        )
+
+    async def get_file(self, request: web.Request) -> web.Response:
+        return web.json_response(self._file(request.match_info["name"]))
+
+    async def generate_content(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        pdf_part = body["contents"][0]["parts"][0]
+        file_data = pdf_part.get("fileData")
+        if self.rate_limited:
+            self.rate_limited -= 1
+            return web.json_response(
+                {
+                    "error": {
+                        "code": 429,
+                        "message": "Resource has been exhausted",
+                        "status": "RESOURCE_EXHAUSTED",
+                    }
+                },
+                status=429,
+            )
+        if file_data:
+            self.file_requests += 1
+            # The SDK nests FileData unconverted, so its fields stay snake_case
+            file_uri = file_data.get("file_uri") or file_data.get("fileUri")
+            if file_uri in self.dropped:
+                return web.json_response(
+                    {
+                        "error": {
+                            "code": 403,
+                            "message": "You do not have permission to access the File",
+                            "status": "PERMISSION_DENIED",
+                        }
+                    },
+                    status=403,
+                )
+        else:
+            self.inline_requests += 1
+
+        return web.json_response(
+            {
+                "candidates": [
+                    {
+                        "content": {"role": "model", "parts": [{"text": "{}"}]},
+                        "finishReason": "STOP",
+                    }
+                ]
+            }
+        )
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    server = FakeGemini()
+    monkeypatch.setattr(extract, "GEM_KEY", "test-key")
+    monkeypatch.setattr(extract, "GEMINI_UPLOAD_PDFS", True)
+    extract._uploaded_pdfs.clear()
+    yield server
+    extract._uploaded_pdfs.clear()
+
+
+async def _summarize(pdf_bytes: bytes) -> list:
+    extractor = Extractor(pdf_bytes)
+    return await asyncio.gather(
+        *(extractor._generate_content(prompt, schema) for prompt, schema in PROMPTS)
+    )
+
+
+def test_each_paper_is_uploaded_once(gemini, monkeypatch):
+    async def run():
+        await gemini.start()
+        monkeypatch.setenv("GOOGLE_GEMINI_BASE_URL", gemini.base_url)
+        try:
+            papers = [b"%PDF-1.7 paper one", b"%PDF-1.7 paper two"]
+            # Three concurrent requests per paper, four prompts each
+            results = await asyncio.gather(
+                *(_summarize(pdf) for pdf in papers for _ in range(3))
+            )
+        finally:
+            await gemini.stop()
+        return results
+
+    results = asyncio.run(run())
+
+    assert all(text == "{}" for texts in results for text in texts)
+    assert len(gemini.uploads) == 2
+    assert set(gemini.uploads.values()) == {1}
+    assert gemini.file_requests == 24
+    assert gemini.inline_requests == 0
+
+
+def test_dropped_file_is_evicted_and_sent_inline(gemini, monkeypatch):
+    async def run():
+        await gemini.start()
+        monkeypatch.setenv("GOOGLE_GEMINI_BASE_URL", gemini.base_url)
+        try:
+            pdf_bytes = b"%PDF-1.7 paper one"
+            await _summarize(pdf_bytes)
+
+            # Gemini drops the upload long before our TTL runs out
+            gemini.dropped.add(
+                next(iter(extract._uploaded_pdfs.values())).file_data.file_uri
+            )
+            retried = await _summarize(pdf_bytes)
+            evicted = len(extract._uploaded_pdfs) == 0
+
+            await _summarize(pdf_bytes)
+        finally:
+            await gemini.stop()
+        return retried, evicted
+
+    retried, evicted = asyncio.run(run())
+
+    assert retried == ["{}"] * 4
+    assert evicted
+    assert gemini.inline_requests >= 1
+    assert sum(gemini.uploads.values()) == 2
+
+
+def test_rate_limit_keeps_the_uploaded_file(gemini, monkeypatch):
+    async def run():
+        await gemini.start()
+        monkeypatch.setenv("GOOGLE_GEMINI_BASE_URL", gemini.base_url)
+        try:
+            pdf_bytes = b"%PDF-1.7 paper one"
+            await _summarize(pdf_bytes)
+
+            gemini.rate_limited = 4
+            limited = await _summarize(pdf_bytes)
+            cached = len(extract._uploaded_pdfs) == 1
+
+            await _summarize(pdf_bytes)
+        finally:
+            await gemini.stop()
+        return limited, cached
+
+    limited, cached = asyncio.run(run())
+
+    assert limited == [None] * 4
+    assert cached
+    assert gemini.inline_requests == 0
+    assert sum(gemini.uploads.values()) == 1
@@ -0,0 +1,75 @@
+"""
+LocalStore rewrites a namespace on every upsert, so a paper must reach it
+in one write, and only a bounded number of namespaces stay loaded.
+"""
+
+from services import registry
+from services.store import LocalStore
+from services.vector import VecService, SingletonMeta
+
+from types import SimpleNamespace
+from upstash_vector import Vector
+import asyncio
+
+import numpy as np
+
+
+def _vectors(arxiv_id: str, start: int, n: int) -> list:
+    rng = np.random.default_rng(start)
+    return [
+        Vector(
+            id=f"{arxiv_id}_{i}",
+            vector=rng.standard_normal(8).tolist(),
+            metadata={"text": f"chunk {i}"},
+        )
+        for i in range(start, start + n)
+    ]
+
+
+def test_ingest_writes_a_paper_once(tmp_path, monkeypatch):
+    store = LocalStore(str(tmp_path), quantization="int8")
+    writes = []
+    merge_and_write = store._merge_and_write
+
+    def counting(vectors, namespace):
+        writes.append(len(vectors))
+        merge_and_write(vectors, namespace)
+
+    monkeypatch.setattr(store, "_merge_and_write", counting)
+    attrs = (
+        "model embedding_model embedding_client client tokenizer chunker "
+        "embedding_cache semaphore batcher"
+    )
+    stand_in = SimpleNamespace(store=store, **{a: None for a in attrs.split()})
+    monkeypatch.setattr(registry, "_registry", stand_in)
+
+    async def batches(self):
+        for start in range(0, 30, 10):
+            yield _vectors(self.arxiv_id, start, 10)
+
+    monkeypatch.setattr(VecService, "chunk_and_embed_pdf", batches)
+    SingletonMeta._instances.clear()
+    try:
+        vec = VecService("2401.00001")
+        inserted = asyncio.run(vec.ingest_pdf())
+        entry = asyncio.run(vec._manifest_from_store())
+    finally:
+        SingletonMeta._instances.clear()
+
+    assert inserted == 30
+    assert writes == [30]
+    assert entry.chunk_count == 30
+
+
+def test_loaded_namespaces_are_bounded(tmp_path):
+    store = LocalStore(str(tmp_path), quantization="float16", cache_size=2)
+
+    async def run():
+        for i in range(5):
+            namespace = f"2401.0000{i}"
+            await store.upsert(_vectors(namespace, 0, 4), namespace)
+            matches = await store.query([1.0] * 8, 2, namespace)
+            assert len(matches) == 2
+
+    asyncio.run(run())
+    assert len(store._namespaces) <= 2
@@ -0,0 +1,88 @@
+import asyncio
+import os
+
+from models import ManifestEntry
+from services.manifest import NamespaceManifest
+
+
+def _refresh(entry):
+    calls = []
+
+    async def refresh():
+        calls.append(1)
+        if isinstance(entry, Exception):
+            raise entry
+        return entry
+
+    return refresh, calls
+
+
+def test_fresh_entries_do_not_touch_the_store(tmp_path):
+    manifest = NamespaceManifest(os.path.join(tmp_path, "manifest.json"), ttl=60)
+    refresh, calls = _refresh(None)
+
+    async def run():
+        await manifest.record("2401.00001", 12)
+        return await manifest.lookup("2401.00001", refresh)
+
+    entry = asyncio.run(run())
+    assert entry.chunk_count == 12
+    assert calls == []
+
+
+def test_expired_entry_is_dropped_when_the_store_lost_the_paper(tmp_path):
+    path = os.path.join(tmp_path, "manifest.json")
+    manifest = NamespaceManifest(path, ttl=0)
+    refresh, calls = _refresh(None)
+
+    async def run():
+        await manifest.record("2401.00001", 12)
+        return await manifest.lookup("2401.00001", refresh)
+
+    assert asyncio.run(run()) is None
+    assert calls == [1]
+    assert manifest.get("2401.00001") is None
+    assert NamespaceManifest(path).get("2401.00001") is None
+
+
+def test_expired_entry_is_kept_when_the_store_is_unreachable(tmp_path):
+    manifest = NamespaceManifest(os.path.join(tmp_path, "manifest.json"), ttl=0)
+    refresh, _ = _refresh(ConnectionError("store down"))
+
+    async def run():
+        await manifest.record("2401.00001", 12)
+        return await manifest.lookup("2401.00001", refresh)
+
+    assert asyncio.run(run()).chunk_count == 12
+
+
+def test_reverified_entry_keeps_its_ingestion_time(tmp_path):
+    manifest = NamespaceManifest(os.path.join(tmp_path, "manifest.json"), ttl=0)
+    refresh, _ = _refresh(ManifestEntry(namespace="2401.00001", chunk_count=12))
+
+    async def run():
+        recorded = await manifest.record("2401.00001", 12)
+        return recorded, await manifest.lookup("2401.00001", refresh)
+
+    recorded, entry = asyncio.run(run())
+    assert entry.ingested_at == recorded.ingested_at
+    assert entry.verified_at >= recorded.verified_at
+
+
+def test_entry_forgotten_by_another_worker_stays_forgotten(tmp_path):
+    path = os.path.join(tmp_path, "manifest.json")
+    first, second = NamespaceManifest(path, ttl=60), NamespaceManifest(path, ttl=60)
+    refresh, calls = _refresh(None)
+
+    async def run():
+        await first.record("2401.00001", 12)
+        assert (await second.lookup("2401.00001", refresh)).chunk_count == 12
+        await first.forget("2401.00001")
+        forgotten = await second.lookup("2401.00001", refresh)
+        await second.record("2401.00002", 8)
+        return forgotten
+
+    assert asyncio.run(run()) is None
+    assert calls == [1]
+    assert NamespaceManifest(path).get("2401.00001") is None
+    assert NamespaceManifest(path).get("2401.00002").chunk_count == 8
@@ -0,0 +1,38 @@
+import asyncio
+
+import pymupdf
+
+from services.parser import PDFParser, page_ranges, pdf_page_subset
+
+
+def _make_pdf(pages: int) -> bytes:
+    doc = pymupdf.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"Page marker {i}")
+    return doc.tobytes()
+
+
+def test_page_subset_keeps_only_its_pages():
+    subset = pdf_page_subset(_make_pdf(10), 4, 7)
+    with pymupdf.open(stream=subset, filetype="pdf") as doc:
+        assert doc.page_count == 3
+        assert "Page marker 4" in doc[0].get_text()
+
+
+def test_long_paper_is_admitted_as_one_job():
+    async def run():
+        parser = PDFParser(workers=2, queue_size=0, timeout=60)
+        try:
+            pdf_bytes = _make_pdf(200)
+            ranges = page_ranges(200, 16)
+            assert len(ranges) > parser.workers + parser.queue_size
+
+            results = await parser.ranges_to_markdown(pdf_bytes, ranges)
+            assert not [r for r in results if isinstance(r, BaseException)]
+            assert "Page marker 0" in results[0]
+            assert "Page marker 199" in results[-1]
+            assert parser.stats()["rejected"] == 0
+        finally:
+            parser.shutdown()
+
+    asyncio.run(run())
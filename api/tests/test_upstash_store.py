@@ -0,0 +1,64 @@
+"""
+A process without a manifest entry must recognise a paper that is fully
+ingested in Upstash from the store alone.
+"""
+
+from config import EMB_MODEL
+from services import registry
+from services.store import UpstashStore
+from services.vector import VecService, SingletonMeta
+
+from types import SimpleNamespace
+from upstash_vector.types import FetchResult, NamespaceInfo
+import asyncio
+
+
+class StandInIndex:
+    """AsyncIndex that, like Upstash, returns metadata only when asked to"""
+
+    def __init__(self, chunk_count: int, indexed: int):
+        self.chunk_count = chunk_count
+        self.indexed = indexed
+
+    async def fetch(self, ids, include_metadata=False, namespace=""):
+        metadata = {"chunk_count": self.chunk_count, "embedding_model": EMB_MODEL}
+        return [
+            FetchResult(id=i, metadata=metadata if include_metadata else None)
+            for i in ids
+        ]
+
+    async def info(self):
+        namespace = NamespaceInfo(
+            vector_count=self.indexed,
+            pending_vector_count=self.chunk_count - self.indexed,
+        )
+        return SimpleNamespace(namespaces={"2401.00001": namespace})
+
+
+def _entry_from_store(monkeypatch, index):
+    store = UpstashStore(url="https://stand-in.upstash.io", token="stand-in")
+    store.index = index
+    attrs = (
+        "model embedding_model embedding_client client tokenizer chunker "
+        "embedding_cache semaphore batcher"
+    )
+    stand_in = SimpleNamespace(store=store, **{a: None for a in attrs.split()})
+    monkeypatch.setattr(registry, "_registry", stand_in)
+    SingletonMeta._instances.clear()
+    try:
+        return asyncio.run(VecService("2401.00001")._manifest_from_store())
+    finally:
+        SingletonMeta._instances.clear()
+
+
+def test_ingested_paper_is_found_in_the_store(monkeypatch):
+    entry = _entry_from_store(monkeypatch, StandInIndex(chunk_count=40, indexed=40))
+    assert entry is not None
+    assert entry.chunk_count == 40
+    assert entry.embedding_model == EMB_MODEL
+
+
+def test_vectors_still_being_indexed_count_as_stored(monkeypatch):
+    entry = _entry_from_store(monkeypatch, StandInIndex(chunk_count=40, indexed=25))
+    assert entry is not None
+    assert entry.chunk_count == 40
@@ -0,0 +1,79 @@
+"""
+Per-paper VecService state must stay small: the models live once in the
+process-wide registry, and idle papers are evicted.
+"""
+
+from config import VEC_SERVICE_CACHE_SIZE
+from services import registry
+from services.vector import VecService, SingletonMeta
+
+import asyncio
+import gc
+import os
+
+import numpy as np
+import pytest
+
+pytestmark = pytest.mark.skipif(
+    not os.path.exists("/proc/self/statm"), reason="RSS is read from /proc"
+)
+
+DIM = 384
+
+
+def _rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        resident_pages = int(f.read().split()[1])
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+class StandInRegistry:
+    """Registry whose 'model' is a large array, so a copy per paper would show"""
+
+    def __init__(self):
+        self.model = "tokenizer"
+        self.embedding_model = "embedder"
+        self.embedding_client = np.ones((64, 1024, 1024), dtype=np.uint8)
+        self.tokenizer = object()
+        self.chunker = object()
+        self.client = object()
+        self.store = object()
+        self.embedding_cache = object()
+        self.semaphore = asyncio.Semaphore(5)
+        self.batcher = object()
+
+
+def _touch(arxiv_id: str) -> VecService:
+    vec = VecService(arxiv_id)
+    rng = np.random.default_rng(abs(hash(arxiv_id)) % 2**32)
+    for _ in range(4):
+        vec.past_answers.add(rng.standard_normal(DIM), 5, "An answer " * 50)
+    return vec
+
+
+def test_rss_is_flat_across_1000_papers(monkeypatch):
+    stand_in = StandInRegistry()
+    monkeypatch.setattr(registry, "_registry", stand_in)
+    SingletonMeta._instances.clear()
+
+    try:
+        # Fill the per-paper LRU so the measured window is steady state
+        for i in range(VEC_SERVICE_CACHE_SIZE + 50):
+            _touch(f"warmup.{i:05d}")
+        gc.collect()
+        before = _rss_bytes()
+
+        services = [_touch(f"2401.{i:05d}") for i in range(1000)]
+        shared = all(
+            vec.embedding_client is stand_in.embedding_client for vec in services
+        )
+        del services
+        gc.collect()
+        growth = _rss_bytes() - before
+        cached = len(SingletonMeta._instances)
+    finally:
+        SingletonMeta._instances.clear()
+
+    assert shared
+    assert cached <= VEC_SERVICE_CACHE_SIZE
+    assert growth < 16 * 1024 * 1024, f"RSS grew by {growth / 2**20:.1f} MiB"